@@ -1,6 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
 
 
+# Packages PyInstaller would otherwise follow from optional imports of pandas,
+# scipy and scikit-learn; none of them is used, and each one slows the first start
+EXCLUDES = [
+    'selenium', 'webdriver_manager',
+    'matplotlib', 'IPython', 'jupyter', 'jupyter_client', 'jupyter_core', 'ipykernel',
+    'notebook', 'nbformat', 'zmq', 'tornado', 'jedi', 'parso',
+    'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx',
+    'pytest', '_pytest', 'hypothesis',
+    'sphinx', 'docutils', 'pydoc_data', 'lib2to3', 'tkinter.test', 'unittest.test',
+    'sqlalchemy', 'psycopg2', 'pymysql', 'botocore', 'boto3', 's3fs', 'fsspec', 'gcsfs',
+    'numba', 'llvmlite', 'dask', 'distributed', 'tables', 'h5py', 'xlsxwriter', 'odf', 'pyxlsb',
+    'bs4', 'html5lib', 'jinja2', 'markupsafe',
+]
+
 a = Analysis(
     ['main.py'],
     pathex=[],
@@ -10,7 +24,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Edit benchmark: time editing a bank with the 'hashing' profile, through
+SimilarityCalculator.add()/update()/remove() and by reloading an edited file,
+which applies the edits to the cached index instead of fitting again, and check
+the result against a full fit of the same questions.
+
+    python benchmarks/bench_incremental.py [--size 20000] [--edits 50]
+
+The API run times --edits single-question updates, adds and removes, then the
+reweight() that settles them. The reloads cover appended questions only,
+deleted questions only, and an edit of a question whose matrix row it shared
+with a duplicate. Exits with an error when a reload did not take the
+incremental path or scores differ by more than --tolerance from the full fit.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_bank
+from utils.index_cache import load_bank
+from utils.instrumentation import metrics
+from utils.similarity import SimilarityCalculator
+
+PROFILE = 'hashing'
+
+
+def write_bank(path: str, ids, questions):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'question'])
+        writer.writerows(zip(ids, questions))
+
+
+def pair_scores(calculator: SimilarityCalculator, query: int, neighbours: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one question with others, from the fitted matrix"""
+    matrix = calculator.tfidf_matrix
+    rows = calculator.question_rows
+    return (matrix[rows[neighbours]] @ matrix[rows[query]].T).toarray().ravel()
+
+
+def compare(edited: SimilarityCalculator, full: SimilarityCalculator, queries: np.ndarray,
+            top_n: int) -> float:
+    """Largest score difference over the full fit's top neighbours of every query"""
+    worst = 0.0
+    for query in queries.tolist():
+        neighbours = np.array([idx for idx, _ in full.get_similar_questions(query, top_n)], dtype=np.int64)
+        if not len(neighbours):
+            continue
+        difference = np.abs(pair_scores(edited, query, neighbours) - pair_scores(full, query, neighbours))
+        worst = max(worst, float(difference.max()))
+    return worst
+
+
+def shared_row_question(ids, questions) -> int:
+    """A question whose text, after preprocessing, another question repeats"""
+    calculator = SimilarityCalculator(profile=PROFILE)
+    calculator.fit(questions)
+    shared = np.flatnonzero(np.diff(calculator.row_members_ptr) > 1)
+    if not len(shared):
+        sys.exit("The synthetic bank has no duplicates to edit")
+    return int(calculator.row_members[calculator.row_members_ptr[shared[0]]])
+
+
+def edit_api(ids, questions, extra_ids, extra_questions, args, rng) -> float:
+    """Edit a fitted bank one question at a time, print the timings; returns the score difference"""
+    edited = SimilarityCalculator(profile=PROFILE)
+    edited.fit(questions, ids)
+    picked = rng.choice(len(ids), size=2 * args.edits, replace=False).tolist()
+    updated, removed = picked[:args.edits], picked[args.edits:]
+
+    timings = {'update': [], 'add': [], 'remove': []}
+    for i, position in enumerate(updated):
+        start = time.perf_counter()
+        edited.update([ids[position]], [questions[position] + ' معدل'])
+        timings['update'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        edited.add([extra_ids[i]], [extra_questions[i]])
+        timings['add'].append(time.perf_counter() - start)
+    for position in removed:
+        start = time.perf_counter()
+        edited.remove([ids[position]])
+        timings['remove'].append(time.perf_counter() - start)
+    start = time.perf_counter()
+    edited.reweight()
+    reweight_seconds = time.perf_counter() - start
+
+    full = SimilarityCalculator(profile=PROFILE)
+    start = time.perf_counter()
+    full.fit(list(edited.questions), list(edited.ids))
+    full_seconds = time.perf_counter() - start
+
+    queries = rng.choice(len(edited.questions), size=min(args.queries, len(edited.questions)), replace=False)
+    worst = compare(edited, full, queries, args.top_n)
+    # The first edit also sets up the editable copy of the index
+    per_edit = '  '.join(f"{name} {1000 * np.median(seconds):.2f}ms (first {1000 * seconds[0]:.1f}ms)"
+                         for name, seconds in timings.items())
+    print(f"{'api':<16} {per_edit}  reweight {reweight_seconds:.3f}s  full fit {full_seconds:7.3f}s  "
+          f"max score difference {worst:.4f}")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000, help="Questions in the bank")
+    parser.add_argument('--edits', type=int, default=50, help="Questions edited, appended or deleted")
+    parser.add_argument('--queries', type=int, default=200, help="Questions whose scores are compared")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help="Allowed score difference from a full fit")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    ids, questions = generate_bank(args.size + args.edits, seed=args.seed)
+    extra_ids, extra_questions = ids[args.size:], questions[args.size:]
+    ids, questions = ids[:args.size], questions[:args.size]
+    shared = shared_row_question(ids, questions)
+    edited_questions = list(questions)
+    edited_questions[shared] = questions[shared] + ' معدل'
+
+    scenarios = [
+        ('append', ids + extra_ids, questions + extra_questions),
+        ('delete', ids[args.edits:], questions[args.edits:]),
+        ('edit_shared_row', ids, edited_questions),
+    ]
+    rng = np.random.default_rng(args.seed)
+    failures = []
+    worst = edit_api(ids, questions, extra_ids, extra_questions, args, rng)
+    if worst > args.tolerance:
+        failures.append(f"api: scores differ by {worst:.4f} from a full fit")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, new_ids, new_questions in scenarios:
+            path = os.path.join(workdir, f'{name}.csv')
+            write_bank(path, ids, questions)
+            load_bank(path, SimilarityCalculator(profile=PROFILE))
+
+            write_bank(path, new_ids, new_questions)
+            metrics.reset()
+            edited = SimilarityCalculator(profile=PROFILE)
+            start = time.perf_counter()
+            loaded_ids, loaded_questions = load_bank(path, edited)
+            seconds = time.perf_counter() - start
+            incremental = 'refit' in metrics.snapshot()['timers'] and 'fit' not in metrics.snapshot()['timers']
+
+            full = SimilarityCalculator(profile=PROFILE)
+            start = time.perf_counter()
+            full.fit(new_questions)
+            full_seconds = time.perf_counter() - start
+
+            queries = rng.choice(len(new_questions), size=min(args.queries, len(new_questions)), replace=False)
+            worst = compare(edited, full, queries, args.top_n)
+            print(f"{name:<16} reload {seconds:7.3f}s  full fit {full_seconds:7.3f}s  "
+                  f"incremental={incremental}  max score difference {worst:.4f}")
+
+            if not incremental:
+                failures.append(f"{name}: the reload fitted the whole bank")
+            if list(loaded_ids) != new_ids or list(loaded_questions) != new_questions:
+                failures.append(f"{name}: the reloaded questions do not match the file")
+            if worst > args.tolerance:
+                failures.append(f"{name}: scores differ by {worst:.4f} from a full fit")
+
+    if failures:
+        sys.exit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
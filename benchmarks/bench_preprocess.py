@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: ArabicProcessor.preprocess / preprocess_batch against the
+original multi-pass regex implementation, checking the outputs match exactly.
+
+    python benchmarks/bench_preprocess.py [--count 100000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.arabic_processor import ArabicProcessor
+
+
+def legacy_preprocess(text: str) -> str:
+    """The original six-regex preprocessing pipeline"""
+    if not text:
+        return ""
+    text = text.strip().lower()
+    text = re.sub(r'[\u064B-\u065F\u0670]', '', text)
+    text = re.sub(r'[إأآا]', 'ا', text)
+    text = re.sub(r'ة', 'ه', text)
+    text = re.sub(r'ى', 'ي', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    words = text.split()
+    return ' '.join(word for word in words if word not in ArabicProcessor.STOP_WORDS)
+
+
+WORDS = [
+    'مَا', 'هِيَ', 'العَاصِمَةُ', 'المِصْرِيَّةُ', 'كيف', 'يمكنني', 'تعلّم', 'البرمجة',
+    'إلى', 'أفضل', 'طريقة', 'آخر', 'مدينة', 'كبرى', 'في', 'السعودية', 'عدد', 'سكان',
+    'Python', 'HTML', '2024', 'مستشفى', 'الفيزياء', 'الكيمياء', 'ٱلْقُرْآنِ',
+]
+PUNCTUATION = ['', '', '', '؟', '?', '،', ',', '.', '!', ':', '(', ')', '"', '-']
+SPACES = [' ', ' ', ' ', '  ', '\t', ' ', '\n']
+
+
+def make_questions(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(3, 15)):
+            parts.append(rng.choice(WORDS) + rng.choice(PUNCTUATION))
+            parts.append(rng.choice(SPACES))
+        questions.append(rng.choice(['', ' ']) + ''.join(parts))
+    questions.extend(['', '   ', '؟؟', 'ما', 'ما\x1eهي', 'ΟΔΟΣ Σ'])
+    return questions
+
+
+def timed(func, questions):
+    start = time.perf_counter()
+    result = func(questions)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help="Number of synthetic questions")
+    args = parser.parse_args()
+
+    questions = make_questions(args.count)
+
+    legacy_time, expected = timed(lambda qs: [legacy_preprocess(q) for q in qs], questions)
+    single_time, single = timed(lambda qs: [ArabicProcessor.preprocess(q) for q in qs], questions)
+    batch_time, batch = timed(lambda qs: list(ArabicProcessor.preprocess_batch(qs)), questions)
+
+    if single != expected or batch != expected:
+        mismatch = next(i for i, q in enumerate(expected) if single[i] != q or batch[i] != q)
+        sys.exit(f"Output mismatch for {questions[mismatch]!r}: "
+                 f"{expected[mismatch]!r} vs {single[mismatch]!r} / {batch[mismatch]!r}")
+
+    print(f"{len(questions)} questions, outputs identical")
+    print(f"legacy regex      {legacy_time:8.3f}s")
+    print(f"preprocess        {single_time:8.3f}s  ({legacy_time / single_time:.1f}x)")
+    print(f"preprocess_batch  {batch_time:8.3f}s  ({legacy_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: time and peak memory of load, preprocess, fit, single query,
+batch query and export on seeded synthetic banks, compared against a baseline.
+
+    python benchmarks/run.py [--sizes 1000,10000,100000,1000000] [--output results.json]
+    python benchmarks/run.py --save-baseline          # record benchmarks/baseline.json
+    python benchmarks/run.py --threshold 0.25         # exit 1 on a >25% regression
+
+Every stage is timed (best of --repeat runs), then run once more under
+tracemalloc for its peak Python/NumPy allocation (skip with --no-memory).
+The same seed gives the same banks, so results are comparable between runs
+on the same machine.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_bank
+from utils.arabic_processor import ArabicProcessor
+from utils.candidate_index import CANDIDATE_INDEXES, make_candidate_index
+from utils.data_loader import DataLoader
+from utils.duplicate_finder import DuplicateFinder
+from utils.similarity import SimilarityCalculator
+from utils.vectorizer_profiles import DEFAULT_PROFILE, VECTORIZER_PROFILES
+
+STAGES = ('load', 'preprocess', 'fit', 'single_query', 'batch_query', 'export')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Differences below these are noise whatever the ratio
+MIN_SECONDS_DELTA = 0.005
+MIN_BYTES_DELTA = 1024 ** 2
+
+
+def measure(func, memory: bool, repeat: int = 1) -> dict:
+    """Best seconds of repeat calls of func, and its peak traced allocation from one more call"""
+    timings = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    result = {'seconds': min(timings)}
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_size(size: int, args, workdir: str) -> dict:
+    ids, questions = generate_bank(size, seed=args.seed, duplicate_rate=args.duplicate_rate,
+                                   diacritics_rate=args.diacritics_rate, mean_words=args.mean_words)
+    bank_path = os.path.join(workdir, f'bank_{size}.csv')
+    with open(bank_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'question'])
+        writer.writerows(zip(ids, questions))
+
+    def fit():
+        calculator = SimilarityCalculator(n_jobs=args.jobs,
+                                          candidate_index=make_candidate_index(args.candidates),
+                                          profile=args.vectorizer)
+        calculator.fit(questions)
+        return calculator
+
+    calculator = fit()
+    rng = np.random.default_rng(args.seed)
+    single = rng.integers(0, size, min(args.queries, size))
+    batch = rng.integers(0, size, min(args.batch, size))
+
+    def single_query():
+        for idx in single:
+            calculator.get_similar_questions(int(idx), top_n=args.top_n)
+
+    report_path = os.path.join(workdir, f'report_{size}.csv')
+    stages = {
+        'load': lambda: DataLoader.load(bank_path),
+        'preprocess': lambda: list(ArabicProcessor.preprocess_batch(questions)),
+        'fit': fit,
+        'single_query': single_query,
+        'batch_query': lambda: calculator.get_similar_batch(batch, top_n=args.top_n),
+        'export': lambda: DuplicateFinder(calculator, top_n=args.top_n, min_score=args.min_score)
+        .write_report(report_path, ids, questions, file_format='csv'),
+    }
+
+    results = {}
+    for stage in args.stages:
+        results[stage] = measure(stages[stage], not args.no_memory, args.repeat)
+        if stage == 'single_query':
+            results[stage]['per_query_seconds'] = results[stage]['seconds'] / max(len(single), 1)
+        print(format_row(size, stage, results[stage]), flush=True)
+    results['memory_report'] = calculator.memory_report()
+    return results
+
+
+def format_row(size, stage: str, result: dict) -> str:
+    peak = result.get('peak_bytes')
+    peak = f"{peak / 1024 ** 2:10.1f} MB" if peak is not None else ''
+    return f"{size:>9} {stage:<13} {result['seconds']:10.3f}s {peak}"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Stages slower or larger than the baseline by more than threshold (a fraction)"""
+    regressions = []
+    for size, stages in results['results'].items():
+        for stage, result in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if base is None or stage not in STAGES:
+                continue
+            for key, floor in (('seconds', MIN_SECONDS_DELTA), ('peak_bytes', MIN_BYTES_DELTA)):
+                if key not in result or key not in base:
+                    continue
+                if result[key] > base[key] * (1 + threshold) and result[key] - base[key] > floor:
+                    regressions.append(f"{size} {stage} {key}: {base[key]:.4g} -> {result[key]:.4g} "
+                                       f"(+{(result[key] / base[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def environment() -> dict:
+    import scipy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help="Comma-separated bank sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument('--stages', default=','.join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed slowdown or memory growth over the baseline (0.2 = 20%%)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per stage; the best one counts")
+    parser.add_argument('--no-memory', action='store_true', help="Only time the stages")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--diacritics-rate', type=float, default=0.2)
+    parser.add_argument('--mean-words', type=float, default=9.0)
+    parser.add_argument('--queries', type=int, default=100, help="Questions timed one by one")
+    parser.add_argument('--batch', type=int, default=1000, help="Questions in the batch query")
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--min-score', type=float, default=0.8)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--candidates', choices=['all', *CANDIDATE_INDEXES], default='all')
+    parser.add_argument('--vectorizer', choices=VECTORIZER_PROFILES, default=DEFAULT_PROFILE)
+    args = parser.parse_args()
+
+    args.stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = {
+        'environment': environment(),
+        'settings': {key: value for key, value in vars(args).items()
+                     if key not in ('output', 'baseline', 'save_baseline', 'threshold')},
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            results['results'][str(size)] = bench_size(size, args, workdir)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (record one with --save-baseline)")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != results['environment']:
+        print("Warning: the baseline was recorded in a different environment")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
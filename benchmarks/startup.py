@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: launch the GUI repeatedly and report how long the window and
+the similarity engine take to come up, from source or from the frozen bundle.
+
+    python benchmarks/startup.py [--runs 10] [--output startup.json]
+    python benchmarks/startup.py --command "dist/Questions Similarity Finder/Questions Similarity Finder"
+
+Each launch writes its own timings (see QSIM_STARTUP_REPORT in ui/app.py) and
+exits once the engine is ready; the wall-clock time of the launch itself, which
+includes interpreter or bootloader start, is measured here. Needs a display.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from ui.app import STARTUP_REPORT_ENV
+
+METRICS = ('window_s', 'engine_ready_s', 'process_s')
+
+
+def launch(command, timeout: float) -> dict:
+    """Start the app once and return its startup report"""
+    with tempfile.TemporaryDirectory() as workdir:
+        report_path = os.path.join(workdir, 'startup.json')
+        env = dict(os.environ, **{STARTUP_REPORT_ENV: report_path})
+        start = time.time()
+        subprocess.run(command, env=env, cwd=ROOT, timeout=timeout, check=True)
+        elapsed = time.time() - start
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+
+    # From the launch, not from the first Python line of the app
+    offset = report['process_start'] - start
+    report['window_s'] += offset
+    report['engine_ready_s'] += offset
+    report['interpreter_s'] = offset
+    report['process_s'] = elapsed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="Launches to measure")
+    parser.add_argument('--command', help="Command starting the app (default: this Python with main.py)")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds allowed per launch")
+    parser.add_argument('--output', help="Write every launch and the summary to this JSON file")
+    args = parser.parse_args()
+
+    command = shlex.split(args.command) if args.command else [sys.executable, os.path.join(ROOT, 'main.py')]
+    runs = []
+    for number in range(1, args.runs + 1):
+        report = launch(command, args.timeout)
+        runs.append(report)
+        print(f"run {number}: window {report['window_s']:.3f}s, engine ready {report['engine_ready_s']:.3f}s, "
+              f"heavy modules before window: {', '.join(report['modules_before_window']) or 'none'}",
+              flush=True)
+
+    summary = {metric: {'median': statistics.median(run[metric] for run in runs),
+                        'min': min(run[metric] for run in runs)}
+               for metric in METRICS}
+    print(f"{'frozen' if runs[0]['frozen'] else 'source'} build, {len(runs)} launches")
+    for metric, values in summary.items():
+        print(f"  {metric:<15} median {values['median']:.3f}s  min {values['min']:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'command': command, 'platform': platform.platform(),
+                       'summary': summary, 'runs': runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Seeded generator of synthetic Arabic question banks for benchmarks.
+
+Words are built from random three-letter roots poured into common morphological
+patterns, with clitic prefixes, and drawn with a Zipf-like frequency, so the
+n-gram statistics look like real text. The same seed always gives the same bank.
+
+    from benchmarks.synthetic import generate_bank
+    ids, questions = generate_bank(10000, seed=0, duplicate_rate=0.1)
+"""
+
+import random
+from itertools import accumulate
+from typing import List, Tuple
+
+LETTERS = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+# f, a, l stand for the three root letters
+PATTERNS = ['fal', 'faal', 'fail', 'mafal', 'mafool', 'tafeel', 'istifal', 'infial',
+            'iftial', 'fual', 'faeel', 'mufaal', 'tafaul', 'fila']
+PATTERN_LETTERS = {'f': 0, 'a': 1, 'l': 2}
+PATTERN_VOWELS = {'a': 'ا', 'o': 'و', 'e': 'ي', 'i': 'ا', 'u': 'و', 'm': 'م', 't': 'ت', 's': 'س', 'n': 'ن'}
+PREFIXES = ['', '', '', 'ال', 'ال', 'وال', 'بال', 'لل', 'و', 'ب']
+QUESTION_WORDS = ['ما', 'ماذا', 'كيف', 'متى', 'أين', 'هل', 'لماذا', 'من', 'كم', 'أي']
+STOP_WORDS = ['في', 'من', 'إلى', 'على', 'عن', 'هو', 'هي', 'التي', 'الذي', 'مع', 'أن']
+DIACRITICS = ['َ', 'ُ', 'ِ', 'ْ', 'ّ', 'ً']
+ALEF_VARIANTS = {'ا': 'أ', 'أ': 'ا', 'إ': 'ا', 'ه': 'ة', 'ي': 'ى'}
+ENDINGS = ['؟', '؟', '?', '', '.']
+
+
+def _word(rng: random.Random) -> str:
+    root = [rng.choice(LETTERS) for _ in range(3)]
+    pattern = rng.choice(PATTERNS)
+    # Only the first occurrence of f/a/l is a root letter; the rest are vowels
+    seen = set()
+    letters = []
+    for symbol in pattern:
+        if symbol in PATTERN_LETTERS and symbol not in seen:
+            seen.add(symbol)
+            letters.append(root[PATTERN_LETTERS[symbol]])
+        else:
+            letters.append(PATTERN_VOWELS.get(symbol, ''))
+    return rng.choice(PREFIXES) + ''.join(letters)
+
+
+def _add_diacritics(word: str, rng: random.Random) -> str:
+    return ''.join(letter + rng.choice(DIACRITICS) if '\u0621' <= letter <= '\u064A' and rng.random() < 0.6
+                   else letter for letter in word)
+
+
+def _variant(question: str, rng: random.Random) -> str:
+    """Same question after preprocessing: different diacritics, letter forms or punctuation"""
+    choice = rng.random()
+    if choice < 0.4:
+        return ' '.join(_add_diacritics(word, rng) for word in question.split())
+    if choice < 0.8:
+        return ''.join(ALEF_VARIANTS.get(letter, letter) if rng.random() < 0.5 else letter
+                       for letter in question)
+    return question.rstrip('؟?.') + rng.choice(['؟!', ' ؟', '...', '!'])
+
+
+def generate_bank(count: int, seed: int = 0, duplicate_rate: float = 0.1,
+                  near_duplicate_rate: float = 0.1, diacritics_rate: float = 0.2,
+                  mean_words: float = 9.0, sd_words: float = 3.0, min_words: int = 3,
+                  max_words: int = 30, vocabulary_size: int = 20000) -> Tuple[List[str], List[str]]:
+    """
+    Returns (ids, questions).
+    duplicate_rate: share of questions repeating an earlier one exactly or as a variant
+    that is identical after preprocessing (diacritics, alef forms, punctuation)
+    near_duplicate_rate: share of questions copying an earlier one with one word changed
+    diacritics_rate: share of fresh questions written with diacritics
+    mean_words, sd_words, min_words, max_words: words per question (clipped normal)
+    """
+    rng = random.Random(seed)
+    vocabulary = [_word(rng) for _ in range(vocabulary_size)]
+    weights = list(accumulate(1.0 / (rank + 1) for rank in range(vocabulary_size)))
+
+    questions: List[str] = []
+    for _ in range(count):
+        draw = rng.random()
+        if questions and draw < duplicate_rate:
+            original = rng.choice(questions)
+            questions.append(original if rng.random() < 0.3 else _variant(original, rng))
+            continue
+        if questions and draw < duplicate_rate + near_duplicate_rate:
+            words = rng.choice(questions).split()
+            position = rng.randrange(len(words))
+            words[position] = rng.choices(vocabulary, cum_weights=weights)[0]
+            questions.append(' '.join(words))
+            continue
+
+        length = int(round(rng.gauss(mean_words, sd_words)))
+        length = min(max(length, min_words), max_words)
+        words = [rng.choice(QUESTION_WORDS)]
+        for word in rng.choices(vocabulary, cum_weights=weights, k=length - 1):
+            if rng.random() < 0.15:
+                words.append(rng.choice(STOP_WORDS))
+            words.append(word)
+        question = ' '.join(words) + rng.choice(ENDINGS)
+        if rng.random() < diacritics_rate:
+            question = ' '.join(_add_diacritics(word, rng) for word in question.split())
+        questions.append(question)
+
+    ids = [f"Q{i + 1:07d}" for i in range(count)]
+    return ids, questions
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+# Headless entry point for build servers and cron jobs. It never imports tkinter;
+# pandas and scikit-learn are only imported once a command actually needs them.
+#
+#   python cli.py report bank.xlsx -o pairs.csv --clusters clusters.csv
+#   python cli.py similar bank.xlsx --id 17 --id 42 -o similar.jsonl
+#   python cli.py compare incoming.xlsx --reference bank.xlsx -o matches.csv
+#   python cli.py report huge_bank.parquet -o pairs.csv --shards 8
+#   python cli.py serve bank.xlsx --port 8765 --candidates inverted
+#   python cli.py recall bank.xlsx --candidates inverted --min-score 0.5
+#   python cli.py report bank.xlsx -o pairs.csv --vectorizer balanced
+#   python cli.py tune bank.xlsx --pairs known_duplicates.csv --min-recall 0.95
+#   python cli.py report bank.xlsx -o pairs.csv --log-json metrics.jsonl --profile report.prof
+
+import argparse
+import atexit
+import csv
+import json
+import sys
+import time
+from utils.vectorizer_profiles import DEFAULT_PROFILE, VECTORIZER_PROFILES
+
+
+def output_format(path: str, requested: str) -> str:
+    """Explicit --format, otherwise guessed from the file extension"""
+    if requested:
+        return requested
+    return 'jsonl' if path and path.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def load(args, file_path: str = None):
+    """Load and fit the question bank named on the command line"""
+    from utils.candidate_index import make_candidate_index
+    from utils.index_cache import load_bank
+    from utils.instrumentation import peak_memory_bytes
+    from utils.similarity import SimilarityCalculator
+
+    start = time.perf_counter()
+    calculator = SimilarityCalculator(n_jobs=args.jobs,
+                                      candidate_index=make_candidate_index(args.candidates),
+                                      profile=args.vectorizer)
+    ids, questions = load_bank(file_path or args.file, calculator)
+    log(args, f"Loaded {len(questions)} questions in {time.perf_counter() - start:.2f}s")
+    memory = calculator.memory_report()
+    log(args, f"Index uses {memory['total_bytes'] / 1024 ** 2:.1f} MB "
+              f"({memory['bytes_per_question']:.0f} bytes per question)")
+    peak = peak_memory_bytes()
+    if peak:
+        log(args, f"Peak process memory so far: {peak / 1024 ** 2:.1f} MB")
+
+    if getattr(args, 'shards', 0) > 1:
+        from utils.sharded_index import ShardedSimilarityIndex
+        # Same query methods, scored by worker processes over shared memory
+        sharded = ShardedSimilarityIndex(calculator, args.shards).start()
+        atexit.register(sharded.close)
+        return sharded, ids, questions
+    return calculator, ids, questions
+
+
+def log(args, message: str):
+    if not args.quiet:
+        print(message, file=sys.stderr, flush=True)
+
+
+def run_report(args) -> int:
+    """Whole-bank duplicate report"""
+    calculator, ids, _ = load(args)
+    from utils.duplicate_finder import DuplicateFinder
+
+    def progress(done, total):
+        log(args, f"  {done}/{total} questions scored")
+
+    start = time.perf_counter()
+    finder = DuplicateFinder(calculator, top_n=args.top_n, min_score=args.min_score)
+    clusters = finder.run(args.output, ids, progress, output_format(args.output, args.format))
+    log(args, f"Wrote pairs to {args.output} in {time.perf_counter() - start:.2f}s; "
+              f"{len(clusters)} duplicate clusters")
+
+    if args.clusters:
+        finder.write_clusters(args.clusters, clusters, ids, output_format(args.clusters, args.format))
+    return 0
+
+
+def run_similar(args) -> int:
+    """Similar questions for specific question ids"""
+    calculator, ids, questions = load(args)
+
+    positions = {qid: i for i, qid in enumerate(ids)}
+    missing = [qid for qid in args.id if qid not in positions]
+    if missing:
+        print(f"Unknown question ids: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    query_indices = [positions[qid] for qid in args.id]
+    indptr, neighbours, scores = calculator.get_similar_batch(query_indices, args.top_n, args.min_score)
+
+    file_format = output_format(args.output, args.format)
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if file_format == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(['query_id', 'neighbour_id', 'score', 'question'])
+        for i, query_idx in enumerate(query_indices):
+            for idx, score in zip(neighbours[indptr[i]:indptr[i + 1]].tolist(),
+                                  scores[indptr[i]:indptr[i + 1]].tolist()):
+                record = [ids[query_idx], ids[idx], round(score, 4), questions[idx]]
+                if file_format == 'csv':
+                    writer.writerow(record)
+                else:
+                    out.write(json.dumps(dict(zip(('query_id', 'neighbour_id', 'score', 'question'),
+                                                  record)), ensure_ascii=False) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def run_compare(args) -> int:
+    """Duplicates of a new batch of questions within an existing reference bank"""
+    calculator, ids, questions = load(args, args.reference)
+    from utils.data_loader import DataLoader
+    from utils.duplicate_finder import DuplicateFinder
+
+    new_ids, new_questions = DataLoader.load(args.file)
+
+    def progress(done, total):
+        log(args, f"  {done}/{total} new questions scored")
+
+    # Intake reports are read by people, so Excel is also accepted here
+    file_format = ('xlsx' if not args.format and args.output.lower().endswith('.xlsx')
+                   else output_format(args.output, args.format))
+
+    start = time.perf_counter()
+    finder = DuplicateFinder(calculator, top_n=args.top_n, min_score=args.min_score)
+    written, matched = finder.write_cross_report(args.output, new_ids, new_questions, ids, questions,
+                                                 progress, file_format)
+    log(args, f"Wrote {written} matches to {args.output} in {time.perf_counter() - start:.2f}s; "
+              f"{matched} of {len(new_questions)} new questions have a match")
+    return 0
+
+
+def run_serve(args) -> int:
+    """Resident lookup service"""
+    from utils import service
+    service.main([args.file, '--host', args.host, '--port', str(args.port), '--jobs', str(args.jobs),
+                  '--candidates', args.candidates, '--shards', str(args.shards),
+                  '--vectorizer', args.vectorizer])
+    return 0
+
+
+def run_recall(args) -> int:
+    """Recall and latency of candidate-based queries against exhaustive scoring"""
+    calculator, _, _ = load(args)
+    if calculator.candidate_index is None:
+        print("Choose a candidate index to measure with --candidates", file=sys.stderr)
+        return 2
+    report = calculator.measure_recall(args.sample, args.top_n, args.min_score, args.seed)
+    print(json.dumps({key: round(value, 4) for key, value in report.items()}))
+    return 0
+
+
+def run_tune(args) -> int:
+    """Cost and recall of every vectorizer profile, to choose one"""
+    from utils.data_loader import DataLoader
+    from utils.tuning import read_pairs, recommend, tune_profiles
+
+    ids, questions = DataLoader.load(args.file)
+    pairs = None
+    if args.pairs:
+        try:
+            pairs = read_pairs(args.pairs, ids)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        log(args, f"Querying {min(args.queries, len(pairs))} of {len(pairs)} known duplicate pairs")
+    else:
+        log(args, f"No --pairs: querying edited copies of {min(args.queries, len(questions))} questions")
+
+    columns = ('profile', 'features', 'fit_s', 'index_mb', 'query_ms', 'query_p95_ms', 'recall')
+    print(f"{'profile':<10} {'features':>9} {'fit s':>8} {'index MB':>9} {'query ms':>9} "
+          f"{'p95 ms':>8} {f'recall@{args.top_n}':>10}", flush=True)
+
+    def show(result):
+        print(f"{result['profile']:<10} {result['features']:>9} {result['fit_s']:>8.2f} "
+              f"{result['index_mb']:>9.1f} {result['query_ms']:>9.2f} {result['query_p95_ms']:>8.2f} "
+              f"{result['recall']:>10.3f}", flush=True)
+
+    profiles = args.profiles.split(',') if args.profiles else None
+    results = tune_profiles(questions, pairs, profiles, args.top_n, args.queries, args.sample,
+                            args.candidates, args.jobs, args.seed, progress=show)
+
+    best = recommend(results, args.min_recall)
+    if best:
+        print(f"Fastest profile with recall@{args.top_n} >= {args.min_recall}: {best['profile']} "
+              f"(use --vectorizer {best['profile']})")
+    else:
+        print(f"No profile reaches recall@{args.top_n} >= {args.min_recall}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'file': args.file, 'pairs': args.pairs, 'top_n': args.top_n,
+                       'min_recall': args.min_recall, 'recommended': best and best['profile'],
+                       'results': [{key: result[key] for key in (*columns, 'questions', 'queries')}
+                                   for result in results]}, f, indent=2)
+    return 0 if best else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Arabic questions similarity finder (headless)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(command):
+        command.add_argument('file', help="Question bank with id and question columns "
+                                              "(xlsx, xls, csv, parquet or jsonl)")
+        command.add_argument('--jobs', type=int, default=-1,
+                             help="Worker processes for fitting large banks (default: all cores)")
+        command.add_argument('--quiet', action='store_true', help="No progress messages on stderr")
+        command.add_argument('--candidates', choices=('all', 'inverted', 'lsh'), default='all',
+                             help="Rows each query scores: all of them (exact, default), those "
+                                  "sharing a rare word (inverted) or a MinHash bucket (lsh)")
+        command.add_argument('--log-json', metavar='FILE',
+                             help="Append timings, sizes and peak memory as JSON lines "
+                                  "(default: $QSIM_METRICS_LOG, else off)")
+        command.add_argument('--profile', metavar='FILE', help="Write a cProfile dump of the command")
+
+    def add_vectorizer(command):
+        command.add_argument('--vectorizer', choices=VECTORIZER_PROFILES, default=DEFAULT_PROFILE,
+                             help="Vectorizer profile: n-gram range and feature cap "
+                                  "(compare them with the tune command)")
+
+    def add_shards(command):
+        command.add_argument('--shards', type=int, default=0,
+                             help="Score with this many worker processes sharing the index "
+                                  "(exhaustive; for banks of millions of questions)")
+
+    def add_query(command, top_n, min_score, formats=('csv', 'jsonl')):
+        command.add_argument('--top-n', type=int, default=top_n, help="Neighbours kept per question")
+        command.add_argument('--min-score', type=float, default=min_score,
+                             help="Minimum similarity between 0 and 1")
+        command.add_argument('--format', choices=formats,
+                             help="Output format (default: from the file extension, else csv)")
+
+    report = commands.add_parser('report', help="Find duplicates across the whole bank")
+    add_common(report)
+    add_vectorizer(report)
+    add_query(report, 10, 0.8)
+    add_shards(report)
+    report.add_argument('-o', '--output', required=True, help="Pairs output file")
+    report.add_argument('--clusters', help="Also write duplicate clusters to this file")
+    report.set_defaults(handler=run_report)
+
+    similar = commands.add_parser('similar', help="Similar questions for given question ids")
+    add_common(similar)
+    add_vectorizer(similar)
+    add_query(similar, 100, 0.3)
+    add_shards(similar)
+    similar.add_argument('--id', action='append', required=True, help="Question id (repeatable)")
+    similar.add_argument('-o', '--output', help="Output file (default: stdout)")
+    similar.set_defaults(handler=run_similar)
+
+    compare = commands.add_parser('compare', help="Match new questions against a reference bank")
+    add_common(compare)
+    add_vectorizer(compare)
+    add_query(compare, 5, 0.8, formats=('csv', 'jsonl', 'xlsx'))
+    add_shards(compare)
+    compare.add_argument('--reference', required=True,
+                         help="Existing question bank; fitted once and cached like any bank")
+    compare.add_argument('-o', '--output', required=True, help="Matches output file")
+    compare.set_defaults(handler=run_compare)
+
+    serve = commands.add_parser('serve', help="Serve free-text lookups over local HTTP/JSON")
+    add_common(serve)
+    add_vectorizer(serve)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    add_shards(serve)
+    serve.set_defaults(handler=run_serve)
+
+    recall = commands.add_parser('recall', help="Measure what --candidates loses against exact scoring")
+    add_common(recall)
+    add_vectorizer(recall)
+    add_query(recall, 10, 0.5)
+    recall.add_argument('--sample', type=int, default=200, help="Questions queried both ways")
+    recall.add_argument('--seed', type=int, default=0)
+    recall.set_defaults(handler=run_recall)
+
+    tune = commands.add_parser('tune', help="Compare vectorizer profiles on known duplicates")
+    add_common(tune)
+    tune.add_argument('--pairs', metavar='FILE',
+                      help="CSV of known duplicate question id pairs (default: edited copies "
+                           "of random questions, which must find their original)")
+    tune.add_argument('--profiles', help="Comma-separated profiles to try (default: all)")
+    tune.add_argument('--top-n', type=int, default=10, help="Recall is measured in this many neighbours")
+    tune.add_argument('--min-recall', type=float, default=0.9, help="Accuracy bar for the recommendation")
+    tune.add_argument('--queries', type=int, default=500, help="Known duplicates queried per profile")
+    tune.add_argument('--sample', type=int, default=0,
+                      help="Fit on this many questions of the bank (default: all)")
+    tune.add_argument('--seed', type=int, default=0)
+    tune.add_argument('-o', '--output', help="Also write the results to this JSON file")
+    tune.set_defaults(handler=run_tune)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    from utils.instrumentation import configure_logging, metrics
+
+    configure_logging(args.log_json)
+    try:
+        with metrics.profile(args.profile):
+            return args.handler(args)
+    finally:
+        metrics.log_summary()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,10 +6,21 @@
 # source venv/bin/activate (macOS/Linux) or venv\Scripts\activate (Windows)
 # pip install -r requirements.txt
 
+import time
+
+# First thing, so startup reports include every import below
+STARTED = time.time()
+
+import multiprocessing
+import os
 import tkinter as tk
-from ui.app import QuestionsSim
+from ui.app import STARTUP_REPORT_ENV, QuestionsSim
 
 if __name__ == "__main__":
+    # Needed by the parallel fit's process pool in the frozen Windows build
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = QuestionsSim(root)
-    root.mainloop()
\ No newline at end of file
+    if os.environ.get(STARTUP_REPORT_ENV):
+        app.write_startup_report(os.environ[STARTUP_REPORT_ENV], STARTED)
+    root.mainloop()
@@ -1,17 +1,34 @@
 import tkinter as tk
+import importlib.util
 from tkinter import ttk, filedialog, messagebox
-from typing import List
+from typing import List, Optional, Tuple
 import sys
 import os
 import threading
-import pandas as pd
+import time
+import json
 from datetime import datetime
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.data_loader import DataLoader
-from utils.similarity import SimilarityCalculator
+# Only light modules here: numpy, scipy, scikit-learn and pandas take seconds to
+# import, so they are loaded in the background once the window is up
+from ui.virtual_list import VirtualTreeview
+from utils.instrumentation import LOG_ENV, configure_logging, metrics, profile_path
+from utils.vectorizer_profiles import DEFAULT_PROFILE, VECTORIZER_PROFILES
+
+# Wait this long after the last keystroke before filtering the questions list
+SEARCH_DEBOUNCE_MS = 200
+
+# Timings and sizes of every session, so a slow run can be diagnosed afterwards
+METRICS_LOG_PATH = os.path.join(os.path.expanduser('~'), '.questions_sim', 'metrics.jsonl')
+
+# Start importing the similarity engine this long after the window is created
+ENGINE_START_DELAY_MS = 100
+
+# Set to a file path to measure one launch: the app writes its startup timings there and exits
+STARTUP_REPORT_ENV = 'QSIM_STARTUP_REPORT'
 
 class QuestionsSim:
     def __init__(self, root):
@@ -21,10 +38,51 @@ class QuestionsSim:
         
         self.ids = []
         self.questions = []
-        self.similarity_calc = SimilarityCalculator()
+        self.file_path = None
+        self.search_index = None
+        self.selected_idx = None
+        self._search_after = None
+        self._query_started = None
+        self.metrics_log = configure_logging(os.environ.get(LOG_ENV) or METRICS_LOG_PATH)
+        # Created by the background warm-up, see start_engine()
+        self.similarity_calc = None
+        self.query_worker = None
+        self._engine_ready = threading.Event()
+        self._engine_error = None
         self.min_similarity = 30.0  # القيمة الافتراضية
+        self.vectorizer_profile = DEFAULT_PROFILE
         
         self.setup_ui()
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.root.after(ENGINE_START_DELAY_MS, self.start_engine)
+    
+    def start_engine(self):
+        """Import the numeric stack and create the similarity calculator off the Tk thread"""
+        def warm_up():
+            try:
+                with metrics.stage('engine_start'):
+                    from ui.query_worker import QueryWorker
+                    from utils.similarity import SimilarityCalculator
+                    # Needed by the first load and export; imported now so they do not wait
+                    import utils.duplicate_finder, utils.index_cache, utils.search_index  # noqa: F401
+                    
+                    calculator = SimilarityCalculator(n_jobs=-1, profile=self.vectorizer_profile)
+                    self.query_worker = QueryWorker(self.root, calculator)
+                    self.similarity_calc = calculator
+            except Exception as e:
+                self._engine_error = str(e)
+            finally:
+                self._engine_ready.set()
+        
+        thread = threading.Thread(target=warm_up, name='engine-start')
+        thread.daemon = True
+        thread.start()
+    
+    def wait_for_engine(self):
+        """Block until start_engine() is done; only call from worker threads"""
+        self._engine_ready.wait()
+        if self._engine_error:
+            raise Exception(f"Could not start the similarity engine: {self._engine_error}")
     
     def setup_ui(self):
         """Setup the user interface"""
@@ -69,6 +127,20 @@ class QuestionsSim:
         ttk.Button(similarity_frame, text="Apply", 
                   command=self.on_similarity_change).pack(side=tk.LEFT, padx=5)
         
+        # Vectorizer profile: speed against how finely questions are told apart
+        ttk.Separator(top_frame, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=10)
+        
+        ttk.Label(top_frame, text="Vectorizer:",
+                 font=('Arial', 10)).pack(side=tk.LEFT, padx=5)
+        self.profile_var = tk.StringVar(value=self.vectorizer_profile)
+        profile_combobox = ttk.Combobox(top_frame,
+                                        textvariable=self.profile_var,
+                                        values=list(VECTORIZER_PROFILES),
+                                        state='readonly',
+                                        width=10)
+        profile_combobox.pack(side=tk.LEFT, padx=5)
+        profile_combobox.bind('<<ComboboxSelected>>', lambda e: self.on_profile_change())
+        
         # Progress bar frame
         self.progress_frame = ttk.Frame(self.root)
         self.progress_frame.pack(fill=tk.X, padx=10)
@@ -76,6 +148,11 @@ class QuestionsSim:
         self.progress_bar = ttk.Progressbar(self.progress_frame, mode='indeterminate')
         self.progress_label = ttk.Label(self.progress_frame, text="")
         
+        # Status bar: timings, sizes and memory of the current file
+        self.status_bar = ttk.Label(self.root, text="Ready", anchor=tk.W, relief=tk.SUNKEN,
+                                    font=('Arial', 9), padding=(10, 2))
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        
         # Main container
         main_container = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
         main_container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -118,7 +195,6 @@ class QuestionsSim:
         self.questions_tree = ttk.Treeview(list_frame, 
                                           columns=('ID', 'Question'),
                                           show='tree headings',
-                                          yscrollcommand=y_scrollbar.set,
                                           xscrollcommand=x_scrollbar.set,
                                           selectmode='browse')
         
@@ -131,10 +207,13 @@ class QuestionsSim:
         
         self.questions_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        y_scrollbar.config(command=self.questions_tree.yview)
         x_scrollbar.config(command=self.questions_tree.xview)
         
-        self.questions_tree.bind('<<TreeviewSelect>>', self.on_question_select)
+        # Only the visible rows exist in the treeview; it handles scrolling and selection
+        self.questions_list = VirtualTreeview(
+            self.questions_tree, y_scrollbar,
+            lambda idx: (self.ids[idx], self.questions[idx]),
+            self.on_question_select)
         
         # Alternating row colors
         self.questions_tree.tag_configure('oddrow', background='#f0f0f0')
@@ -161,6 +240,13 @@ class QuestionsSim:
                                        state=tk.DISABLED)
         self.export_button.pack(side=tk.RIGHT, padx=5)
         
+        # Whole-bank export button
+        self.export_all_button = ttk.Button(header_right_frame, 
+                                           text="📊 Export All", 
+                                           command=self.export_all_results,
+                                           state=tk.DISABLED)
+        self.export_all_button.pack(side=tk.RIGHT, padx=5)
+        
         # Selected question display
         selected_frame = ttk.LabelFrame(right_frame, text="Selected Question", padding=10)
         selected_frame.pack(fill=tk.X, pady=5)
@@ -225,16 +311,25 @@ class QuestionsSim:
             self.min_similarity = new_value
             
             # إعادة عرض النتائج إذا كان هناك سؤال محدد
-            selection = self.questions_tree.selection()
-            if selection and len(self.questions) > 0:
-                actual_idx = int(selection[0])
-                self.display_similar_questions(actual_idx)
+            if self.selected_idx is not None and len(self.questions) > 0:
+                self.display_similar_questions(self.selected_idx)
         
         except tk.TclError:
             # إذا كانت القيمة غير صحيحة، استخدم القيمة الافتراضية
             self.similarity_var.set(30.0)
             self.min_similarity = 30.0
     
+    def on_profile_change(self):
+        """تغيير إعدادات التحويل وإعادة تحميل الملف الحالي بها"""
+        profile = self.profile_var.get()
+        if profile == self.vectorizer_profile:
+            return
+        self.vectorizer_profile = profile
+        
+        # يعاد بناء الفهرس بالإعدادات الجديدة في فهرس منفصل يحل محل الحالي عند اكتماله
+        if self.file_path:
+            self.open_file(self.file_path)
+    
     def show_progress(self, message):
         """Show progress bar"""
         self.progress_label.config(text=message)
@@ -243,35 +338,74 @@ class QuestionsSim:
         self.progress_bar.start(10)
         self.root.update()
     
+    def update_progress(self, done, total):
+        """Show real progress when the total is known"""
+        if not total:
+            return
+        if str(self.progress_bar.cget('mode')) != 'determinate':
+            self.progress_bar.stop()
+            self.progress_bar.config(mode='determinate')
+        self.progress_bar.config(maximum=total, value=min(done, total))
+    
+    def set_progress_status(self, message):
+        """Change the progress message; the next step has no measurable progress"""
+        self.progress_label.config(text=message)
+        if str(self.progress_bar.cget('mode')) != 'indeterminate':
+            self.progress_bar.config(mode='indeterminate', value=0)
+            self.progress_bar.start(10)
+    
     def hide_progress(self):
         """Hide progress bar"""
         self.progress_bar.stop()
+        self.progress_bar.config(mode='indeterminate', value=0)
         self.progress_bar.pack_forget()
         self.progress_label.pack_forget()
         self.root.update()
     
     def load_file(self):
-        """Load Excel file"""
-        file_path = filedialog.askopenfilename(
-            title="Select Excel File",
-            filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")]
-        )
+        """Load questions file"""
+        # Parquet needs pyarrow, an optional dependency; checked without importing it
+        parquet = importlib.util.find_spec('pyarrow') is not None
+        filetypes = [("Question files", "*.xlsx *.xlsm *.xls *.csv"
+                      + (" *.parquet" if parquet else "") + " *.jsonl *.ndjson"),
+                     ("Excel files", "*.xlsx *.xlsm *.xls"),
+                     ("CSV files", "*.csv")]
+        if parquet:
+            filetypes.append(("Parquet files", "*.parquet"))
+        filetypes += [("JSON Lines files", "*.jsonl *.ndjson"), ("All files", "*.*")]
+        file_path = filedialog.askopenfilename(title="Select Questions File", filetypes=filetypes)
         
         if not file_path:
             return
-        
+        self.open_file(file_path)
+    
+    def open_file(self, file_path):
+        """Load and fit a questions file with the selected vectorizer profile"""
         # Disable button during loading
-        self.show_progress("Loading Excel file...")
+        self.show_progress("Loading questions file...")
+        
+        profile = self.vectorizer_profile
         
         def load_thread():
             try:
-                self.ids, self.questions = DataLoader.load_excel(file_path)
+                self.wait_for_engine()
+                from utils.index_cache import load_bank
+                from utils.search_index import SearchIndex
+                from utils.similarity import SimilarityCalculator
                 
-                self.root.after(0, lambda: self.progress_label.config(text="Processing questions..."))
-                self.similarity_calc.fit(self.questions)
+                # Fitted on its own: lookups and exports keep reading the current index until the swap
+                calculator = SimilarityCalculator(n_jobs=-1, profile=profile)
+                with metrics.profile(profile_path('load')), \
+                        metrics.stage('open_file', file=os.path.basename(file_path)) as info:
+                    ids, questions = load_bank(
+                        file_path, calculator,
+                        status=lambda message: self.root.after(0, self.set_progress_status, message),
+                        progress=lambda done, total: self.root.after(0, self.update_progress, done, total))
+                    search_index = SearchIndex(ids, questions)
+                    info['questions'] = len(questions)
                 
                 # Update UI in main thread
-                self.root.after(0, self.on_load_complete, file_path)
+                self.root.after(0, self.on_load_complete, file_path, calculator, ids, questions, search_index)
             
             except Exception as e:
                 self.root.after(0, self.on_load_error, str(e))
@@ -280,13 +414,21 @@ class QuestionsSim:
         thread.daemon = True
         thread.start()
     
-    def on_load_complete(self, file_path):
-        """Called when loading is complete"""
+    def on_load_complete(self, file_path, calculator, ids, questions, search_index):
+        """Called when loading is complete: install the new bank and its index"""
         self.hide_progress()
+        self.file_path = file_path
+        self.similarity_calc = calculator
+        self.ids, self.questions, self.search_index = ids, questions, search_index
+        # Lookups clicked while the file was loading were scored against the previous bank
+        self.query_worker.reset(calculator)
         filename = file_path.split('/')[-1]
         self.file_label.config(text=f"✓ {filename} ({len(self.questions)} questions)")
         self.count_label.config(text=f"({len(self.questions)})")
-        self.populate_questions_list()
+        self.selected_idx = self.questions_list.selected_row = None
+        self.populate_questions_list(self.search_var.get())
+        self.export_all_button.config(state=tk.NORMAL)
+        self.update_status_bar()
         messagebox.showinfo("Success", f"Loaded {len(self.questions)} questions successfully!")
     
     def on_load_error(self, error_message):
@@ -296,28 +438,23 @@ class QuestionsSim:
     
     def populate_questions_list(self, filter_text=""):
         """Populate the questions treeview"""
-        self.questions_tree.delete(*self.questions_tree.get_children())
-        
-        count = 0
-        for i, (qid, question) in enumerate(zip(self.ids, self.questions)):
-            if filter_text.lower() in question.lower() or filter_text.lower() in str(qid).lower():
-                tag = 'evenrow' if count % 2 == 0 else 'oddrow'
-                self.questions_tree.insert('', tk.END, values=(qid, question), 
-                                          tags=(tag,), iid=str(i))
-                count += 1
+        if self.search_index is None:
+            return
+        self.questions_list.set_rows(self.search_index.search(filter_text))
     
     def filter_questions(self, *args):
-        """Filter questions based on search text"""
+        """Filter questions based on search text, once typing pauses"""
+        if self._search_after is not None:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(SEARCH_DEBOUNCE_MS, self._apply_filter)
+    
+    def _apply_filter(self):
+        self._search_after = None
         self.populate_questions_list(self.search_var.get())
     
-    def on_question_select(self, event):
+    def on_question_select(self, actual_idx):
         """Handle question selection"""
-        selection = self.questions_tree.selection()
-        if not selection:
-            return
-        
-        # Get actual index
-        actual_idx = int(selection[0])
+        self.selected_idx = actual_idx
         
         # Update selected question label
         self.selected_label.config(state=tk.NORMAL)
@@ -336,12 +473,11 @@ class QuestionsSim:
             return
         
         # الحصول على السؤال المحدد
-        selection = self.questions_tree.selection()
-        if not selection:
+        if self.selected_idx is None:
             messagebox.showwarning("تحذير", "الرجاء تحديد سؤال أولاً!")
             return
         
-        actual_idx = int(selection[0])
+        actual_idx = self.selected_idx
         selected_question = self.questions[actual_idx]
         selected_id = self.ids[actual_idx]
         
@@ -360,6 +496,9 @@ class QuestionsSim:
             messagebox.showwarning("تحذير", "لا توجد بيانات صالحة للتصدير!")
             return
         
+        # pandas is only needed here, so the application starts without it
+        import pandas as pd
+        
         # إنشاء DataFrame
         df = pd.DataFrame(export_data)
         
@@ -404,15 +543,85 @@ class QuestionsSim:
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل التصدير:\n{str(e)}")
 
+    def export_all_results(self):
+        """تصدير الأسئلة المتشابهة لكل أسئلة الملف في الخلفية"""
+        if not self.questions:
+            messagebox.showwarning("تحذير", "الرجاء تحميل ملف أولاً!")
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = filedialog.asksaveasfilename(
+            title="حفظ تقرير كل الأسئلة",
+            defaultextension=".xlsx",
+            initialfile=f"similarity_report_{timestamp}.xlsx",
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        
+        if not file_path:
+            return
+        
+        from utils.duplicate_finder import DuplicateFinder
+        
+        file_format = 'csv' if file_path.lower().endswith('.csv') else 'xlsx'
+        finder = DuplicateFinder(self.similarity_calc, top_n=100,
+                                 min_score=self.min_similarity / 100)
+        ids, questions = self.ids, self.questions
+        
+        self.export_all_button.config(state=tk.DISABLED)
+        self.show_progress("Exporting similar questions for all questions...")
+        
+        def export_thread():
+            try:
+                with metrics.profile(profile_path('export')):
+                    written = finder.write_report(
+                        file_path, ids, questions,
+                        progress=lambda done, total: self.root.after(0, self.update_progress, done, total),
+                        file_format=file_format)
+                self.root.after(0, self.on_export_all_complete, file_path, written, None)
+            except Exception as e:
+                self.root.after(0, self.on_export_all_complete, file_path, 0, str(e))
+        
+        thread = threading.Thread(target=export_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def on_export_all_complete(self, file_path, written, error_message):
+        """Called when the whole-bank export finishes"""
+        self.hide_progress()
+        self.export_all_button.config(state=tk.NORMAL)
+        self.update_status_bar()
+        if error_message:
+            messagebox.showerror("خطأ", f"فشل التصدير:\n{error_message}")
+        else:
+            messagebox.showinfo("نجح", 
+                              f"تم تصدير {written} نتيجة بنجاح!\n\nالملف: {file_path}")
+    
     def display_similar_questions(self, query_idx: int):
-        """Display similar questions"""
+        """Look up similar questions in the background and display them"""
+        # تصفية النتائج حسب الحد الأدنى للتشابه؛ النتائج المحفوظة يعاد تصفيتها فقط
+        self._query_started = time.perf_counter()
+        if not self.query_worker.request(query_idx, self.min_similarity / 100,
+                                         self.show_similar_questions):
+            self.similar_count_label.config(text="(searching...)")
+    
+    def show_similar_questions(self, filtered_similar: List[Tuple[int, float]],
+                               error_message: Optional[str] = None):
+        """Display similar questions, or why they could not be found"""
         self.similar_tree.delete(*self.similar_tree.get_children())
         
-        similar = self.similarity_calc.get_similar_questions(query_idx, top_n=100)
+        if error_message:
+            self._query_started = None
+            self.similar_tree.insert('', tk.END, values=("N/A", "N/A", f"فشل البحث: {error_message}"))
+            self.similar_count_label.config(text="(error)")
+            self.export_button.config(state=tk.DISABLED)
+            return
         
-        # تصفية النتائج حسب الحد الأدنى للتشابه
-        filtered_similar = [(idx, score) for idx, score in similar 
-                           if score * 100 >= self.min_similarity]
+        # From the click to the rendered table, including the wait for the worker
+        if self._query_started is not None:
+            metrics.record('display', time.perf_counter() - self._query_started, rows=len(filtered_similar))
+            self._query_started = None
+        metrics.count('rows_rendered', len(filtered_similar))
+        self.update_status_bar()
         
         if not filtered_similar:
             self.similar_tree.insert('', tk.END, 
@@ -444,4 +653,63 @@ class QuestionsSim:
                                     values=(f"{similarity_percent:.1f}%", 
                                            self.ids[idx], 
                                            self.questions[idx]),
-                                    tags=(tag,))
\ No newline at end of file
+                                    tags=(tag,))
+    
+    def update_status_bar(self):
+        """Show the latest timings, sizes and peak memory in the status bar"""
+        snapshot = metrics.snapshot()
+        timers, gauges, counters = snapshot['timers'], snapshot['gauges'], snapshot['counters']
+        parts = []
+        if 'questions' in gauges:
+            parts.append(f"{gauges['questions']:,} questions")
+        if 'open_file' in timers:
+            detail = 'cached' if gauges.get('cache_hit') else f"fit {timers.get('fit', {}).get('last_s', 0):.2f}s"
+            parts.append(f"opened in {timers['open_file']['last_s']:.2f}s ({detail})")
+        if 'vocabulary' in gauges:
+            parts.append(f"{gauges['vocabulary']:,} n-grams, {gauges['nnz']:,} non-zeros")
+        if 'display' in timers:
+            parts.append(f"last lookup {1000 * timers['display']['last_s']:.0f} ms")
+        if counters.get('queries'):
+            parts.append(f"{counters.get('candidates_scored', 0) / counters['queries']:,.0f} rows scored per query")
+        if snapshot['peak_rss']:
+            parts.append(f"peak memory {snapshot['peak_rss'] / 1024 ** 2:,.0f} MB")
+        self.status_bar.config(text="  ·  ".join(parts) or "Ready")
+    
+    def on_close(self):
+        """Log the session's metrics before the window closes"""
+        metrics.log_summary()
+        self.root.destroy()
+    
+    def write_startup_report(self, path: str, started: float):
+        """
+        Measure this launch, then close: seconds from process start until the window
+        is drawn and until the engine is ready, written as JSON to path.
+        started: time.time() at the very start of the process
+        """
+        shown = {}
+        
+        def on_map(event):
+            if not shown:
+                shown['time'] = time.time()
+                # Heavy modules already imported here delayed the window
+                shown['modules'] = sorted(name for name in ('numpy', 'scipy', 'sklearn', 'pandas')
+                                          if name in sys.modules)
+                self.root.after(0, check_engine)
+        
+        def check_engine():
+            if not self._engine_ready.is_set():
+                self.root.after(10, check_engine)
+                return
+            report = {
+                'frozen': bool(getattr(sys, 'frozen', False)),
+                'window_s': shown['time'] - started,
+                'engine_ready_s': time.time() - started,
+                'modules_before_window': shown['modules'],
+                'engine_error': self._engine_error,
+            }
+            metrics.event('startup', **report)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'process_start': started, **report}, f)
+            self.root.destroy()
+        
+        self.root.bind('<Map>', on_map, add='+')
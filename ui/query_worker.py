@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from utils.similarity import SimilarityCalculator
+
+class QueryWorker:
+    """
+    Run similar-question lookups off the Tk main thread.
+    Only the latest request matters: a newer one cancels a queued lookup and
+    the result of a lookup already running is dropped. Each question's ranked
+    neighbours are kept in an LRU cache, so a new minimum similarity only
+    re-filters them.
+    """
+
+    def __init__(self, root, calculator: SimilarityCalculator, top_n: int = 100, cache_size: int = 256):
+        self.root = root
+        self.calculator = calculator
+        self.top_n = top_n
+        self.cache_size = cache_size
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity-query')
+        self._cache: 'OrderedDict[int, Tuple[np.ndarray, np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Bumped by reset(), so lookups against a previous file are never cached
+        self._epoch = 0
+        self._pending: Optional[Future] = None
+
+    def request(self, query_idx: int, min_score: float,
+                callback: Callable[[List[Tuple[int, float]]], None]) -> bool:
+        """
+        Ask for the neighbours of query_idx scoring at least min_score.
+        callback runs on the Tk thread; it is called right away on a cache hit
+        (returns True) and later otherwise (returns False). If the lookup fails,
+        it receives an empty list and the error message as a second argument.
+        """
+        self._generation += 1
+        generation = self._generation
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+        with self._lock:
+            ranked = self._cache.get(query_idx)
+            if ranked is not None:
+                self._cache.move_to_end(query_idx)
+        if ranked is not None:
+            callback(self.filter(ranked, min_score))
+            return True
+
+        self._pending = self._executor.submit(self._run, generation, self._epoch,
+                                             query_idx, min_score, callback)
+        return False
+
+    def reset(self, calculator: Optional[SimilarityCalculator] = None):
+        """
+        Forget cached results and drop pending lookups, e.g. once another file is loaded.
+        calculator: the newly fitted calculator to run lookups against from now on
+        """
+        if calculator is not None:
+            self.calculator = calculator
+        self._generation += 1
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        with self._lock:
+            self._epoch += 1
+            self._cache.clear()
+
+    @staticmethod
+    def filter(ranked: Tuple[np.ndarray, np.ndarray], min_score: float) -> List[Tuple[int, float]]:
+        indices, scores = ranked
+        # Scores are sorted in descending order
+        count = int(np.count_nonzero(scores >= min_score))
+        return list(zip(indices[:count].tolist(), scores[:count].tolist()))
+
+    def _run(self, generation: int, epoch: int, query_idx: int, min_score: float, callback):
+        # Skipped when the user has already moved on
+        if generation != self._generation:
+            return
+        try:
+            _, indices, scores = self.calculator.get_similar_batch([query_idx], self.top_n)
+        except Exception as e:
+            # Raised inside the future it would go unseen and the pane would wait forever
+            self.root.after(0, self._deliver_error, generation, str(e), callback)
+            return
+
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._cache[query_idx] = (indices, scores)
+            self._cache.move_to_end(query_idx)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        self.root.after(0, self._deliver, generation, (indices, scores), min_score, callback)
+
+    def _deliver(self, generation: int, ranked, min_score: float, callback):
+        if generation == self._generation:
+            callback(self.filter(ranked, min_score))
+
+    def _deliver_error(self, generation: int, message: str, callback):
+        # A failure of a request the user has moved on from does not matter
+        if generation == self._generation:
+            callback([], message)
@@ -0,0 +1,152 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Optional, Sequence, Tuple
+from utils.instrumentation import metrics
+
+class VirtualTreeview:
+    """
+    Show a long list of rows in a ttk.Treeview by materializing only the visible ones.
+    The Treeview holds one item per visible line; scrolling rewrites their values.
+    Rows are positions into the caller's data, resolved through get_values.
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 get_values: Callable[[int], Tuple], on_select: Callable[[int], None]):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.get_values = get_values
+        self.on_select = on_select
+
+        self.rows: Sequence[int] = range(0)
+        self.offset = 0
+        self.visible = 1
+        self.selected_row: Optional[int] = None
+
+        row_height = ttk.Style().lookup('Treeview', 'rowheight')
+        self.row_height = int(row_height) if row_height else 20
+
+        scrollbar.config(command=self.yview)
+
+        tree.bind('<Configure>', self._on_configure)
+        tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        tree.bind('<MouseWheel>', self._on_mousewheel)
+        tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        tree.bind('<Button-5>', lambda e: self.scroll(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'),
+                          ('<Next>', 'page_down'), ('<Home>', 'home'), ('<End>', 'end')):
+            tree.bind(key, lambda e, step=step: self._on_key(step))
+
+    def set_rows(self, rows: Sequence[int]):
+        """Replace the displayed rows (e.g. after filtering) and scroll back to the top"""
+        self.rows = rows
+        self.offset = 0
+        self.render()
+
+    def _max_offset(self) -> int:
+        return max(0, len(self.rows) - self.visible)
+
+    def render(self):
+        """Write the visible slice of rows into the Treeview items"""
+        self.offset = min(max(self.offset, 0), self._max_offset())
+        count = min(self.visible, len(self.rows) - self.offset)
+
+        items = self.tree.get_children()
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+        for line in range(len(items), count):
+            self.tree.insert('', tk.END, iid=str(line))
+
+        selected_line = None
+        for line in range(count):
+            position = self.offset + line
+            row = int(self.rows[position])
+            # Stripes follow the position in the filtered list, as before virtualization
+            tag = 'evenrow' if position % 2 == 0 else 'oddrow'
+            self.tree.item(str(line), values=self.get_values(row), tags=(tag,))
+            if row == self.selected_row:
+                selected_line = str(line)
+
+        if selected_line is not None:
+            self.tree.selection_set(selected_line)
+        elif self.tree.selection():
+            self.tree.selection_set(())
+
+        metrics.count('rows_rendered', count)
+        total = max(len(self.rows), 1)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + count) / total))
+
+    def yview(self, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll n units|pages'"""
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.rows))
+            self.render()
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self.scroll(amount * self.visible if args[2] == 'pages' else amount)
+
+    def scroll(self, lines: int):
+        self.offset += lines
+        self.render()
+
+    def select_position(self, position: int):
+        """Select the row at a position of the displayed list, scrolling it into view"""
+        if not len(self.rows):
+            return
+        position = min(max(position, 0), len(self.rows) - 1)
+        if position < self.offset:
+            self.offset = position
+        elif position >= self.offset + self.visible:
+            self.offset = position - self.visible + 1
+
+        row = int(self.rows[position])
+        changed = row != self.selected_row
+        self.selected_row = row
+        self.render()
+        if changed:
+            self.on_select(row)
+
+    def _selected_position(self) -> Optional[int]:
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        return self.offset + int(selection[0])
+
+    def _on_tree_select(self, event):
+        position = self._selected_position()
+        if position is None or position >= len(self.rows):
+            return
+        row = int(self.rows[position])
+        # Selections made by render() itself report the already selected row
+        if row != self.selected_row:
+            self.selected_row = row
+            self.on_select(row)
+
+    def _on_key(self, step):
+        position = self._selected_position()
+        if position is None:
+            position = self.offset - 1 if step in (1, 'page_down') else self.offset
+        if step == 'page_up':
+            position -= self.visible
+        elif step == 'page_down':
+            position += self.visible
+        elif step == 'home':
+            position = 0
+        elif step == 'end':
+            position = len(self.rows) - 1
+        else:
+            position += step
+        self.select_position(position)
+        return 'break'
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch; macOS reports small deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * delta)
+        return 'break'
+
+    def _on_configure(self, event):
+        # One line is taken by the column headings
+        visible = max(1, event.height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
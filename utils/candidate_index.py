@@ -0,0 +1,97 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from typing import Dict, List, Optional
+from .lsh_index import MinHashLSHIndex
+
+class InvertedIndex:
+    """
+    First stage of a two-stage retrieval: an inverted index from the words of the
+    preprocessed questions (stop words already removed) to the rows containing them.
+    A query's candidates are the rows sharing one of its rarest words; they are then
+    re-ranked with the exact character n-gram cosine.
+    Words found in more than max_df of the rows select almost nothing and are
+    skipped, unless the query has no other word.
+    """
+
+    # build() needs the preprocessed question texts, not only the TF-IDF matrix
+    uses_texts = True
+
+    def __init__(self, max_terms: int = 8, max_df: float = 0.05):
+        self.max_terms = max_terms
+        self.max_df = max_df
+        self.vocabulary: Dict[str, int] = {}
+        self._doc_freq = None
+        self._row_ptr = None
+        self._row_words = None
+        self._postings_ptr = None
+        self._postings = None
+
+    def build(self, matrix: csr_matrix, processed: List[str]) -> 'InvertedIndex':
+        """Index the words of every preprocessed question"""
+        vocabulary: Dict[str, int] = {}
+        row_words: List[int] = []
+        row_ptr = np.zeros(len(processed) + 1, dtype=np.int64)
+        for row, text in enumerate(processed):
+            words = {vocabulary.setdefault(word, len(vocabulary)) for word in text.split()}
+            row_words.extend(words)
+            row_ptr[row + 1] = len(row_words)
+
+        self.vocabulary = vocabulary
+        self._row_ptr = row_ptr
+        self._row_words = np.asarray(row_words, dtype=np.int32)
+        self._doc_freq = np.bincount(self._row_words, minlength=len(vocabulary))
+
+        # The transpose of the row -> words incidence matrix lists the rows of every word
+        incidence = csr_matrix((np.ones(len(row_words), dtype=np.int8), self._row_words, row_ptr),
+                               shape=(len(processed), len(vocabulary)))
+        columns = incidence.tocsc()
+        columns.sort_indices()
+        self._postings_ptr = columns.indptr
+        self._postings = columns.indices
+        return self
+
+    def candidates_for_words(self, words: np.ndarray) -> np.ndarray:
+        """Sorted rows sharing one of the rarest max_terms of the given word ids"""
+        if self._postings is None or not len(words):
+            return np.empty(0, dtype=np.int64)
+
+        doc_freq = self._doc_freq[words]
+        limit = max(1, int(self.max_df * (len(self._row_ptr) - 1)))
+        if np.any(doc_freq <= limit):
+            words, doc_freq = words[doc_freq <= limit], doc_freq[doc_freq <= limit]
+        else:
+            # Only common words: the rarest one still narrows the search
+            rarest = np.argmin(doc_freq)
+            words, doc_freq = words[rarest:rarest + 1], doc_freq[rarest:rarest + 1]
+        words = words[np.argsort(doc_freq, kind='stable')[:self.max_terms]]
+
+        postings = [self._postings[self._postings_ptr[w]:self._postings_ptr[w + 1]] for w in words]
+        return np.unique(np.concatenate(postings)).astype(np.int64)
+
+    def candidates_for_row(self, row: int, min_score: float = 0.0) -> np.ndarray:
+        """Candidates for a row of the indexed bank"""
+        return self.candidates_for_words(self._row_words[self._row_ptr[row]:self._row_ptr[row + 1]])
+
+    def candidates_for_vector(self, vector: csr_matrix, min_score: float = 0.0,
+                              processed_text: Optional[str] = None) -> Optional[np.ndarray]:
+        """Candidates for a question outside the bank; None (score all) without its text"""
+        if processed_text is None:
+            return None
+        words = {self.vocabulary[word] for word in processed_text.split() if word in self.vocabulary}
+        return self.candidates_for_words(np.fromiter(words, dtype=np.int64, count=len(words)))
+
+
+# Candidate indexes selectable by name, e.g. from the command line
+CANDIDATE_INDEXES = {
+    'inverted': InvertedIndex,
+    'lsh': MinHashLSHIndex,
+}
+
+
+def make_candidate_index(name: str) -> Optional[object]:
+    """A new candidate index by name; 'all' means exhaustive scoring (no index)"""
+    if name == 'all':
+        return None
+    if name not in CANDIDATE_INDEXES:
+        raise ValueError(f"Unknown candidate index: {name}")
+    return CANDIDATE_INDEXES[name]()
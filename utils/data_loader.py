@@ -1,29 +1,198 @@
-import pandas as pd
-from typing import List, Tuple
+import csv
+import io
+import json
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+from .instrumentation import metrics
+from .question_store import TextColumn, TextColumnBuilder
+
+# Called with (done, total); total is None when the size is unknown
+Progress = Optional[Callable[[int, Optional[int]], None]]
 
 class DataLoader:
-    """Load questions from Excel file"""
-    
+    """Load questions from Excel, CSV, Parquet or JSONL files"""
+
     @staticmethod
     def load_excel(file_path: str) -> Tuple[List[str], List[str]]:
         """
         Load questions from Excel file with columns: id, question
         Returns: (ids, questions)
         """
+        return DataLoader.load(file_path)
+
+    @staticmethod
+    def load(file_path: str, progress: Progress = None) -> Tuple[List[str], List[str]]:
+        """
+        Load questions from any supported file with columns: id, question
+        Returns: (ids, questions)
+        """
+        ids: List[str] = []
+        questions: List[str] = []
+        DataLoader._collect(file_path, progress, ids, questions)
+        return ids, questions
+
+    @staticmethod
+    def load_columns(file_path: str, progress: Progress = None) -> Tuple[TextColumn, TextColumn]:
+        """
+        Like load(), but every chunk goes straight into compact TextColumns, so the whole
+        file never exists as lists of Python strings.
+        Returns: (ids, questions)
+        """
+        ids, questions = TextColumnBuilder(), TextColumnBuilder()
+        DataLoader._collect(file_path, progress, ids, questions)
+        return ids.build(), questions.build()
+
+    @staticmethod
+    def _collect(file_path: str, progress: Progress, ids, questions):
+        """Extend ids and questions with every chunk of the file"""
+        with metrics.stage('load', file=os.path.basename(file_path),
+                           file_bytes=os.path.getsize(file_path) if os.path.exists(file_path) else None) as info:
+            for chunk_ids, chunk_questions in DataLoader.iter_chunks(file_path, progress=progress):
+                ids.extend(chunk_ids)
+                questions.extend(chunk_questions)
+            info['rows'] = len(questions)
+        metrics.count('rows_loaded', len(questions))
+
+    @staticmethod
+    def iter_chunks(file_path: str, chunk_size: int = 10000,
+                    progress: Progress = None) -> Iterator[Tuple[List[str], List[str]]]:
+        """
+        Stream (ids, questions) chunks without loading the whole file first.
+        Rows without a question are skipped.
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        readers = {
+            '.xlsx': DataLoader._read_xlsx,
+            '.xlsm': DataLoader._read_xlsx,
+            '.xls': DataLoader._read_xls,
+            '.csv': DataLoader._read_csv,
+            '.parquet': DataLoader._read_parquet,
+            '.jsonl': DataLoader._read_jsonl,
+            '.ndjson': DataLoader._read_jsonl,
+        }
+        reader = readers.get(extension)
+        if reader is None:
+            raise Exception(f"Unsupported file type: {extension or file_path}")
+
         try:
-            df = pd.read_excel(file_path)
-            
-            # Validate columns
-            if 'id' not in df.columns or 'question' not in df.columns:
-                raise ValueError("Excel file must have 'id' and 'question' columns")
-            
-            # Remove empty questions
-            df = df.dropna(subset=['question'])
-            
-            ids = df['id'].astype(str).tolist()
-            questions = df['question'].astype(str).tolist()
-            
-            return ids, questions
-        
+            ids: List[str] = []
+            questions: List[str] = []
+            for qid, question in reader(file_path, progress):
+                if question is None or question == '':
+                    continue
+                ids.append('nan' if qid is None else str(qid))
+                questions.append(str(question))
+                if len(questions) >= chunk_size:
+                    yield ids, questions
+                    ids, questions = [], []
+            if questions:
+                yield ids, questions
+
         except Exception as e:
-            raise Exception(f"Error loading Excel file: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error loading file: {str(e)}")
+
+    @staticmethod
+    def _columns(header) -> Tuple[int, int]:
+        names = [None if name is None else str(name).strip() for name in header]
+        if 'id' not in names or 'question' not in names:
+            raise ValueError("File must have 'id' and 'question' columns")
+        return names.index('id'), names.index('question')
+
+    @staticmethod
+    def _read_xlsx(file_path: str, progress: Progress) -> Iterator[tuple]:
+        # Imported here so CSV/JSONL loading does not pay for openpyxl
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError("File must have 'id' and 'question' columns")
+            id_col, question_col = DataLoader._columns(header)
+
+            # Taken from the sheet's declared dimensions, so it may be missing
+            total = sheet.max_row - 1 if sheet.max_row else None
+            done = 0
+            for row in rows:
+                done += 1
+                if len(row) > max(id_col, question_col):
+                    yield row[id_col], row[question_col]
+                if progress and done % 5000 == 0:
+                    progress(done, total)
+            if progress:
+                progress(done, done)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _read_xls(file_path: str, progress: Progress) -> Iterator[tuple]:
+        # openpyxl cannot read the legacy binary format; pandas (xlrd) can
+        import pandas as pd
+
+        df = pd.read_excel(file_path)
+        if 'id' not in df.columns or 'question' not in df.columns:
+            raise ValueError("Excel file must have 'id' and 'question' columns")
+        df = df.dropna(subset=['question'])
+        yield from zip(df['id'].astype(str).tolist(), df['question'].astype(str).tolist())
+        if progress:
+            progress(len(df), len(df))
+
+    @staticmethod
+    def _read_text_lines(file_path: str, progress: Progress,
+                         parse: Callable[[io.TextIOWrapper], Iterator[tuple]]) -> Iterator[tuple]:
+        """Run parse over a UTF-8 text file, reporting progress in bytes"""
+        total = os.path.getsize(file_path)
+        with open(file_path, 'rb') as raw:
+            text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+            for done, row in enumerate(parse(text), start=1):
+                yield row
+                if progress and done % 5000 == 0:
+                    progress(raw.tell(), total)
+        if progress:
+            progress(total, total)
+
+    @staticmethod
+    def _read_csv(file_path: str, progress: Progress) -> Iterator[tuple]:
+        def parse(text):
+            rows = csv.reader(text)
+            id_col, question_col = DataLoader._columns(next(rows, []))
+            for row in rows:
+                if len(row) > max(id_col, question_col):
+                    yield row[id_col], row[question_col]
+
+        return DataLoader._read_text_lines(file_path, progress, parse)
+
+    @staticmethod
+    def _read_jsonl(file_path: str, progress: Progress) -> Iterator[tuple]:
+        def parse(text):
+            for number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'question' not in record:
+                    raise ValueError(f"Line {number} has no 'question' field")
+                yield record.get('id'), record['question']
+
+        return DataLoader._read_text_lines(file_path, progress, parse)
+
+    @staticmethod
+    def _read_parquet(file_path: str, progress: Progress) -> Iterator[tuple]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+
+        parquet = pq.ParquetFile(file_path)
+        names = parquet.schema_arrow.names
+        if 'id' not in names or 'question' not in names:
+            raise ValueError("File must have 'id' and 'question' columns")
+
+        total = parquet.metadata.num_rows
+        done = 0
+        for batch in parquet.iter_batches(batch_size=10000, columns=['id', 'question']):
+            yield from zip(batch.column('id').to_pylist(), batch.column('question').to_pylist())
+            done += batch.num_rows
+            if progress:
+                progress(done, total)
@@ -0,0 +1,251 @@
+import csv
+import json
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from .instrumentation import metrics
+from .similarity import SimilarityCalculator, score_row_bytes
+
+REPORT_COLUMNS = ['Question ID', 'Question', 'Similar ID', 'Similar Question', 'Similarity %']
+REPORT_FORMATS = ('xlsx', 'csv', 'jsonl')
+# Data rows per worksheet; Excel allows 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1048575
+
+
+class ReportWriter:
+    """Append report rows to an Excel (openpyxl write-only), CSV or JSONL file"""
+
+    def __init__(self, file_path: str, file_format: str = 'csv'):
+        self.file_path = file_path
+        self.file_format = file_format
+        self._file = None
+        self._workbook = None
+        self._sheet = None
+        self._sheet_rows = 0
+
+    def __enter__(self):
+        if self.file_format == 'xlsx':
+            # Imported here so CSV/JSONL reports do not pay for openpyxl
+            from openpyxl import Workbook
+            from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+            self._illegal = ILLEGAL_CHARACTERS_RE
+            # Write-only workbooks stream rows to disk instead of keeping cells in memory
+            self._workbook = Workbook(write_only=True)
+            self._add_sheet()
+        else:
+            self._file = open(self.file_path, 'w', newline='', encoding='utf-8')
+            if self.file_format == 'csv':
+                self._csv = csv.writer(self._file)
+                self._csv.writerow(REPORT_COLUMNS)
+        return self
+
+    def _add_sheet(self):
+        number = len(self._workbook.worksheets) + 1
+        self._sheet = self._workbook.create_sheet(
+            'Similar Questions' if number == 1 else f'Similar Questions {number}')
+        for column, width in zip('ABCDE', (15, 80, 15, 80, 15)):
+            self._sheet.column_dimensions[column].width = width
+        self._sheet.append(REPORT_COLUMNS)
+        self._sheet_rows = 0
+
+    def write_rows(self, rows):
+        if self.file_format == 'xlsx':
+            for row in rows:
+                if self._sheet_rows == XLSX_MAX_ROWS:
+                    self._add_sheet()
+                # Control characters that are fine in CSV make Excel files invalid
+                self._sheet.append([self._illegal.sub('', value) if isinstance(value, str) else value
+                                    for value in row])
+                self._sheet_rows += 1
+        elif self.file_format == 'csv':
+            self._csv.writerows(rows)
+        else:
+            self._file.writelines(json.dumps(dict(zip(REPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+                                  for row in rows)
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._workbook is not None:
+            self._workbook.save(self.file_path)
+        if self._file is not None:
+            self._file.close()
+
+
+class DuplicateFinder:
+    """Find near-duplicate questions across a whole fitted question bank"""
+
+    def __init__(self, calculator: SimilarityCalculator, top_n: int = 10,
+                 min_score: float = 0.8, max_block_bytes: int = 256 * 1024 ** 2):
+        self.calculator = calculator
+        self.top_n = top_n
+        self.min_score = min_score
+        self.max_block_bytes = max_block_bytes
+
+    def block_size(self) -> int:
+        """Number of query rows scored at once so one dense score block stays under max_block_bytes"""
+        matrix = self.calculator.tfidf_matrix
+        row_bytes = score_row_bytes(matrix, max(matrix.shape[0], 1))
+        return max(1, self.max_block_bytes // row_bytes)
+
+    def iter_blocks(self, progress: Optional[Callable[[int, int], None]] = None,
+                    vectors: Optional[csr_matrix] = None, texts: Optional[Sequence[str]] = None
+                    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Score the bank against itself one block of rows at a time.
+        vectors: score these questions from outside the bank (see SimilarityCalculator.transform)
+        against it instead; query_idx is then a row of vectors. texts are their questions.
+        Yields flat (query_idx, neighbour_idx, score) arrays for every block.
+        """
+        matrix = self.calculator.tfidf_matrix
+        if matrix is None:
+            return
+
+        n_rows = len(self.calculator.questions) if vectors is None else vectors.shape[0]
+        step = self.block_size()
+
+        for start in range(0, n_rows, step):
+            end = min(start + step, n_rows)
+            if vectors is None:
+                indptr, neighbours, values = self.calculator.get_similar_batch(
+                    np.arange(start, end), self.top_n, self.min_score)
+            else:
+                indptr, neighbours, values = self.calculator.get_similar_vectors(
+                    vectors[start:end], self.top_n, self.min_score,
+                    texts=None if texts is None else texts[start:end])
+            queries = np.repeat(np.arange(start, end), np.diff(indptr))
+            yield queries, neighbours, values
+
+            if progress:
+                progress(end, n_rows)
+
+    def write_pairs(self, file_path: str, ids: Optional[Sequence[str]] = None,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    file_format: str = 'csv') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stream every (query id, neighbour id, score) pair to a CSV or JSONL file.
+        Returns the (query_idx, neighbour_idx) edges for clustering.
+        """
+        if file_format not in ('csv', 'jsonl'):
+            raise ValueError(f"Unsupported output format: {file_format}")
+
+        edge_queries = []
+        edge_neighbours = []
+
+        with metrics.stage('export', report='pairs', format=file_format) as info, \
+                open(file_path, 'w', newline='', encoding='utf-8') as f:
+            if file_format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(['query_id', 'neighbour_id', 'score'])
+
+            for queries, neighbours, values in self.iter_blocks(progress):
+                if ids is None:
+                    query_ids, neighbour_ids = queries.tolist(), neighbours.tolist()
+                else:
+                    query_ids = [ids[i] for i in queries]
+                    neighbour_ids = [ids[i] for i in neighbours]
+                scores = [round(v, 4) for v in values.tolist()]
+
+                if file_format == 'csv':
+                    writer.writerows(zip(query_ids, neighbour_ids, (f"{v:.4f}" for v in scores)))
+                else:
+                    f.writelines(json.dumps({'query_id': q, 'neighbour_id': n, 'score': v},
+                                            ensure_ascii=False) + '\n'
+                                 for q, n, v in zip(query_ids, neighbour_ids, scores))
+
+                edge_queries.append(queries)
+                edge_neighbours.append(neighbours)
+            info['matches'] = sum(len(queries) for queries in edge_queries)
+
+        if not edge_queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(edge_queries), np.concatenate(edge_neighbours)
+
+    def write_report(self, file_path: str, ids: Sequence[str], questions: Sequence[str],
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     file_format: str = 'xlsx') -> int:
+        """
+        Stream every question's matches, with both texts, to an Excel, CSV or JSONL
+        report as the blocks are scored, so memory stays flat for any bank size.
+        Returns the number of matches written.
+        """
+        if file_format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported output format: {file_format}")
+
+        written = 0
+        with metrics.stage('export', report='bank', format=file_format, questions=len(questions)) as info:
+            with ReportWriter(file_path, file_format) as report:
+                for queries, neighbours, values in self.iter_blocks(progress):
+                    report.write_rows(
+                        (ids[q], questions[q], ids[n], questions[n], round(100 * v, 1))
+                        for q, n, v in zip(queries.tolist(), neighbours.tolist(), values.tolist()))
+                    written += len(queries)
+            info['matches'] = written
+        return written
+
+    def write_cross_report(self, file_path: str, new_ids: Sequence[str], new_questions: Sequence[str],
+                           ids: Sequence[str], questions: Sequence[str],
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           file_format: str = 'xlsx') -> Tuple[int, int]:
+        """
+        Match a batch of new questions against the fitted (reference) bank without
+        refitting, streaming each new question's matches to a report.
+        Returns (matches written, new questions with at least one match).
+        """
+        if file_format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported output format: {file_format}")
+
+        with metrics.stage('export', report='cross', format=file_format,
+                           questions=len(new_questions)) as info:
+            vectors = self.calculator.transform(list(new_questions))
+            written = 0
+            matched = 0
+            with ReportWriter(file_path, file_format) as report:
+                for queries, neighbours, values in self.iter_blocks(progress, vectors, new_questions):
+                    report.write_rows(
+                        (new_ids[q], new_questions[q], ids[n], questions[n], round(100 * v, 1))
+                        for q, n, v in zip(queries.tolist(), neighbours.tolist(), values.tolist()))
+                    written += len(queries)
+                    matched += len(np.unique(queries))
+            info.update(matches=written, matched=matched)
+        return written, matched
+
+    def find_clusters(self, edges: Tuple[np.ndarray, np.ndarray]) -> List[np.ndarray]:
+        """Group duplicate pairs into clusters (connected components), largest first"""
+        n_rows = len(self.calculator.questions)
+        queries, neighbours = edges
+        graph = coo_matrix((np.ones(len(queries), dtype=np.int8), (queries, neighbours)),
+                           shape=(n_rows, n_rows))
+        _, labels = connected_components(graph, directed=False)
+
+        order = np.argsort(labels, kind='stable')
+        sizes = np.bincount(labels)
+        groups = np.split(order, np.cumsum(sizes)[:-1])
+        clusters = [group for group in groups if len(group) > 1]
+        clusters.sort(key=len, reverse=True)
+        return clusters
+
+    def run(self, pairs_path: str, ids: Optional[Sequence[str]] = None,
+            progress: Optional[Callable[[int, int], None]] = None,
+            file_format: str = 'csv') -> List[np.ndarray]:
+        """Write all duplicate pairs to pairs_path and return the duplicate clusters"""
+        edges = self.write_pairs(pairs_path, ids, progress, file_format)
+        return self.find_clusters(edges)
+
+    @staticmethod
+    def write_clusters(file_path: str, clusters: List[np.ndarray],
+                       ids: Optional[Sequence[str]] = None, file_format: str = 'csv'):
+        """Write one (cluster, question id) record per clustered question to CSV or JSONL"""
+        if file_format not in ('csv', 'jsonl'):
+            raise ValueError(f"Unsupported output format: {file_format}")
+
+        with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            if file_format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(['cluster', 'question_id'])
+            for number, members in enumerate(clusters, start=1):
+                member_ids = members.tolist() if ids is None else [ids[idx] for idx in members]
+                if file_format == 'csv':
+                    writer.writerows((number, qid) for qid in member_ids)
+                else:
+                    f.writelines(json.dumps({'cluster': number, 'question_id': qid},
+                                            ensure_ascii=False) + '\n' for qid in member_ids)
@@ -0,0 +1,115 @@
+import numpy as np
+from numbers import Integral
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from typing import Optional, Sequence, Tuple
+
+class HashingTfidfVectorizer:
+    """
+    TF-IDF over hashed character n-grams, a drop-in for TfidfVectorizer in
+    SimilarityCalculator. No vocabulary is built, stored or looked up: an n-gram's
+    column is its hash, so fitting is one pass and memory does not grow with the
+    number of distinct n-grams. Colliding n-grams share a column.
+    N-grams the fitted bank does not contain get an IDF of 0, so queries ignore
+    them exactly like TfidfVectorizer ignores words outside its vocabulary.
+    """
+
+    # Nothing to look up by term; kept for code that inspects TfidfVectorizer state
+    vocabulary_ = None
+
+    def __init__(self, analyzer: str = 'char', ngram_range: Tuple[int, int] = (2, 4),
+                 n_features: int = 2 ** 20, min_df=1, max_df=1.0):
+        self.analyzer = analyzer
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.idf_ = None
+        # Document frequency of every column over n_docs_ documents, kept for update_df()
+        self.df_ = None
+        self.n_docs_ = 0
+        self._hasher = HashingVectorizer(analyzer=analyzer, ngram_range=ngram_range,
+                                         n_features=n_features, alternate_sign=False, norm=None)
+
+    def get_params(self, deep: bool = True) -> dict:
+        return {'analyzer': self.analyzer, 'hashing': True, 'max_df': self.max_df,
+                'min_df': self.min_df, 'n_features': self.n_features, 'ngram_range': self.ngram_range}
+
+    def fit_transform(self, documents: Sequence[str],
+                      multiplicity: Optional[np.ndarray] = None) -> csr_matrix:
+        """
+        Learn the IDF of every hashed n-gram and return the TF-IDF matrix.
+        multiplicity: how many times each document occurs in the bank (default once);
+        the IDF is that of the bank with every repetition
+        """
+        counts = self.count(documents)
+        self.df_ = self._document_frequency(counts, multiplicity)
+        self.n_docs_ = counts.shape[0] if multiplicity is None else int(np.sum(multiplicity))
+        self.idf_ = self._idf()
+        return self.weight(counts)
+
+    def count(self, documents: Sequence[str]) -> csr_matrix:
+        """Hashed n-gram counts of documents, for update_df() and weight()"""
+        # HashingVectorizer cannot transform an empty list
+        if not len(documents):
+            return csr_matrix((0, self.n_features), dtype=np.float64)
+        return self._hasher.transform(documents)
+
+    def update_df(self, added: csr_matrix, removed: csr_matrix,
+                  multiplicity: Optional[np.ndarray] = None):
+        """
+        Count documents into and out of the document frequencies, given their count() rows.
+        The cost is that of the changed documents only. The IDF stays as it was until
+        refresh_idf().
+        multiplicity: how many times each added document is added (default once)
+        """
+        if self.df_ is None:
+            raise ValueError("HashingTfidfVectorizer is not fitted")
+        if multiplicity is None:
+            multiplicity = np.ones(added.shape[0], dtype=np.int64)
+        np.add.at(self.df_, added.indices, np.repeat(np.asarray(multiplicity, dtype=np.int64),
+                                                     np.diff(added.indptr)))
+        np.subtract.at(self.df_, removed.indices, 1)
+        self.n_docs_ += int(np.sum(multiplicity)) - removed.shape[0]
+
+    def refresh_idf(self) -> np.ndarray:
+        """Recompute the IDF from the current document frequencies; returns the previous IDF"""
+        previous, self.idf_ = self.idf_, self._idf()
+        return previous
+
+    def _document_frequency(self, counts: csr_matrix, multiplicity: Optional[np.ndarray] = None) -> np.ndarray:
+        if multiplicity is None:
+            return np.bincount(counts.indices, minlength=self.n_features)
+        weights = np.repeat(multiplicity, np.diff(counts.indptr))
+        return np.bincount(counts.indices, weights=weights, minlength=self.n_features).astype(np.int64)
+
+    def _idf(self) -> np.ndarray:
+        df, n_docs = self.df_, self.n_docs_
+        high = self.max_df if isinstance(self.max_df, Integral) else self.max_df * n_docs
+        low = self.min_df if isinstance(self.min_df, Integral) else self.min_df * n_docs
+        if high < low:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        # Smoothed like TfidfVectorizer's default
+        idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+        idf[(df == 0) | (df < low) | (df > high)] = 0
+        if not idf.any():
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+        return idf
+
+    def transform(self, documents: Sequence[str]) -> csr_matrix:
+        """TF-IDF rows for new documents, L2-normalized"""
+        if self.idf_ is None:
+            raise ValueError("HashingTfidfVectorizer is not fitted")
+        return self.weight(self.count(documents))
+
+    def weight(self, counts: csr_matrix) -> csr_matrix:
+        """TF-IDF rows, L2-normalized, from count() rows and the current IDF"""
+        # Scaled entry by entry: the cost follows the rows, not the width of the hashed space
+        matrix = csr_matrix(counts, dtype=np.float64, copy=True)
+        matrix.data *= self.idf_[matrix.indices]
+        if not matrix.shape[0]:
+            # normalize() rejects a matrix without rows
+            return matrix
+        matrix.eliminate_zeros()
+        return normalize(matrix, copy=False)
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from typing import Callable, Optional, Sequence, Tuple
+from .data_loader import DataLoader
+from .hashing_vectorizer import HashingTfidfVectorizer
+from .instrumentation import metrics
+from .question_store import TextColumn
+from .vocabulary import SortedVocabulary
+from .similarity import SimilarityCalculator
+
+# Bump whenever the on-disk layout or the fitted state changes
+CACHE_VERSION = 8
+
+# Above this share of edited questions a reload fits the whole bank again
+INCREMENTAL_MAX_FRACTION = 0.2
+
+class IndexCache:
+    """
+    Persist a fitted similarity index next to its source file, keyed by the file content.
+    Every save writes a new version folder inside the cache directory and then points the
+    'current' file at it, so a version this process still has memory-mapped is never
+    overwritten; it is deleted by a later save once it can be.
+    """
+
+    ARRAYS = ('data', 'indices', 'indptr')
+    POINTER = 'current'
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.cache_dir = file_path + '.simcache'
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """SHA-256 of the file content"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def settings(vectorizer) -> dict:
+        """Vectorizer settings a cached index must have been built with"""
+        params = vectorizer.get_params()
+        return {key: repr(value) for key, value in sorted(params.items())}
+
+    def current_folder(self) -> Optional[str]:
+        """Folder of the current cache version, or None when nothing was saved yet"""
+        try:
+            with open(os.path.join(self.cache_dir, self.POINTER), encoding='utf-8') as f:
+                name = f.read().strip()
+        except OSError:
+            return None
+        return os.path.join(self.cache_dir, name) if name else None
+
+    def load(self, calculator: SimilarityCalculator) -> Optional[Tuple[TextColumn, TextColumn]]:
+        """
+        Restore the fitted state into calculator if a valid cache exists.
+        Returns (ids, questions), or None when the cache is missing or stale.
+        """
+        restored = self._restore(calculator, check_source=True)
+        if restored:
+            calculator.build_indexes()
+        return restored
+
+    def load_previous(self, calculator: SimilarityCalculator) -> Optional[Tuple[TextColumn, TextColumn]]:
+        """
+        Restore the last saved state even if the file changed since, as the starting point
+        for SimilarityCalculator.add(), update() and remove(). Candidate indexes are not built.
+        """
+        return self._restore(calculator, check_source=False)
+
+    def _restore(self, calculator: SimilarityCalculator,
+                 check_source: bool) -> Optional[Tuple[TextColumn, TextColumn]]:
+        folder = self.current_folder()
+        if folder is None:
+            return None
+        try:
+            with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # The vectorizer fit() would use for a bank of this many distinct questions
+        vectorizer = calculator.new_vectorizer(meta.get('shape', [0])[0])
+        if (meta.get('version') != CACHE_VERSION
+                or meta.get('settings') != self.settings(vectorizer)
+                or (check_source and meta.get('source_hash') != self.file_hash(self.file_path))):
+            return None
+
+        # A hashing vectorizer maps n-grams to columns without a vocabulary
+        has_vocabulary = isinstance(vectorizer, TfidfVectorizer)
+        try:
+            if has_vocabulary:
+                terms = np.load(os.path.join(folder, 'vocabulary.npy'), mmap_mode='r')
+            ids, questions = self.load_texts(folder)
+            # Memory-map the matrix so reopening does not read it all into RAM
+            data, indices, indptr = (np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+                                     for name in self.ARRAYS)
+            idf = np.load(os.path.join(folder, 'idf.npy'))
+            question_rows = np.load(os.path.join(folder, 'rows.npy'))
+            if not has_vocabulary:
+                vectorizer.df_ = np.load(os.path.join(folder, 'df.npy'))
+                # Document frequencies count every question, duplicates included
+                vectorizer.n_docs_ = len(question_rows)
+        except (OSError, ValueError):
+            return None
+
+        if has_vocabulary:
+            vectorizer.vocabulary_ = SortedVocabulary(terms)
+            vectorizer.fixed_vocabulary_ = False
+        vectorizer.idf_ = idf
+        calculator.vectorizer = vectorizer
+
+        calculator.questions = questions
+        calculator.ids = ids
+        calculator.processed_questions = []
+        calculator.set_question_rows(question_rows)
+        calculator.tfidf_matrix = csr_matrix((data, indices, indptr),
+                                             shape=tuple(meta['shape']), copy=False)
+        return ids, questions
+
+    def load_texts(self, folder: Optional[str] = None) -> Tuple[TextColumn, TextColumn]:
+        """The cached ids and questions, memory-mapped: only the rows read become resident"""
+        folder = folder or self.current_folder()
+        if folder is None:
+            raise OSError(f"No saved index for {self.file_path}")
+        return TextColumn.load(folder, 'ids'), TextColumn.load(folder, 'questions')
+
+    def save(self, ids: Sequence[str], questions: Sequence[str],
+             calculator: SimilarityCalculator) -> Optional[str]:
+        """
+        Write the fitted state of calculator as the new current cache version.
+        Returns its folder, or None for a bank without questions, which is not saved.
+        """
+        if calculator.tfidf_matrix is None:
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        folder = tempfile.mkdtemp(prefix='v', dir=self.cache_dir)
+        try:
+            self._write(folder, ids, questions, calculator)
+            # Replacing a small file is atomic, and works on Windows while the old version is mapped
+            pointer = os.path.join(self.cache_dir, self.POINTER)
+            with open(pointer + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(os.path.basename(folder))
+            os.replace(pointer + '.tmp', pointer)
+        except BaseException:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+        self.remove_stale(keep=os.path.basename(folder))
+        return folder
+
+    def _write(self, folder: str, ids: Sequence[str], questions: Sequence[str],
+               calculator: SimilarityCalculator):
+        matrix = calculator.tfidf_matrix
+        for name in self.ARRAYS:
+            np.save(os.path.join(folder, f'{name}.npy'), getattr(matrix, name))
+        np.save(os.path.join(folder, 'idf.npy'), calculator.vectorizer.idf_)
+        np.save(os.path.join(folder, 'rows.npy'), calculator.question_rows)
+        df = getattr(calculator.vectorizer, 'df_', None)
+        if df is not None:
+            np.save(os.path.join(folder, 'df.npy'), df)
+
+        TextColumn.from_strings(ids).save(folder, 'ids')
+        TextColumn.from_strings(questions).save(folder, 'questions')
+        vocabulary = calculator.vectorizer.vocabulary_
+        if vocabulary is not None:
+            np.save(os.path.join(folder, 'vocabulary.npy'), vocabulary.terms)
+
+        # Written last: a cache without meta.json is never considered valid
+        with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'source_hash': self.file_hash(self.file_path),
+                'settings': self.settings(calculator.vectorizer),
+                'shape': list(matrix.shape),
+            }, f)
+
+    def remove_stale(self, keep: str):
+        """Delete every cache version but keep; one still memory-mapped is retried by the next save"""
+        for name in os.listdir(self.cache_dir):
+            if name in (keep, self.POINTER):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError as e:
+                metrics.event('cache_cleanup_deferred', path=path, error=str(e))
+
+
+def load_bank(file_path: str, calculator: SimilarityCalculator,
+              status: Optional[Callable[[str], None]] = None,
+              progress: Optional[Callable[[int, Optional[int]], None]] = None
+              ) -> Tuple[TextColumn, TextColumn]:
+    """
+    Load and fit a question bank, reusing the cached index when the file is unchanged.
+    The ids and questions are returned as compact TextColumns, shared with calculator.
+    status: optional callback receiving progress messages
+    progress: optional callback receiving (done, total) while the file is read
+    """
+    cache = IndexCache(file_path)
+    with metrics.stage('cache_load', file=os.path.basename(file_path)) as info:
+        cached = cache.load(calculator)
+        info['hit'] = bool(cached)
+        metrics.gauge('cache_hit', info['hit'])
+        if cached:
+            info.update(calculator.record_sizes())
+    if cached:
+        return cached
+
+    ids, questions = DataLoader.load_columns(file_path, progress)
+
+    if status:
+        status("Processing questions...")
+    if not refit_edits(cache, calculator, ids, questions):
+        calculator.fit(questions, ids)
+
+    # A read-only folder only costs the speed-up next time
+    try:
+        with metrics.stage('cache_save'):
+            folder = cache.save(ids, questions, calculator)
+        if folder:
+            # Read the texts from the saved files from now on: they stay on disk until used
+            ids, questions = cache.load_texts(folder)
+            calculator.ids, calculator.questions = ids, questions
+    except (OSError, ValueError) as e:
+        metrics.event('cache_save_failed', file=file_path, error=str(e))
+        if status:
+            status(f"Could not save the index cache: {e}")
+    return ids, questions
+
+
+def refit_edits(cache: IndexCache, calculator: SimilarityCalculator,
+                ids: TextColumn, questions: TextColumn) -> bool:
+    """
+    Fit calculator by applying the differences between the cached version of the bank
+    and this one with SimilarityCalculator.add(), update() and remove(), when the profile
+    hashes its n-grams, ids are unique and few questions changed.
+    Returns False when a full fit is needed.
+    """
+    if not isinstance(calculator.new_vectorizer(len(questions)), HashingTfidfVectorizer):
+        return False
+    with metrics.stage('refit', questions=len(questions), profile=calculator.profile) as info:
+        info['applied'] = False
+        previous = cache.load_previous(calculator)
+        if previous is None:
+            return False
+        old_ids, old_questions = previous
+        position = {qid: i for i, qid in enumerate(old_ids)}
+        new_ids = list(ids)
+        if len(position) != len(old_ids) or len(set(new_ids)) != len(new_ids):
+            return False
+
+        # Match questions by id, then compare the texts of the matches as bytes
+        matched = np.fromiter((position.get(qid, -1) for qid in new_ids), dtype=np.int64, count=len(new_ids))
+        found = np.flatnonzero(matched >= 0)
+        changed = found[~questions.equal_at(found, old_questions, matched[found])]
+        added = np.flatnonzero(matched < 0)
+        removed = np.setdiff1d(np.arange(len(old_ids)), matched[found])
+        info['edits'] = n_edits = len(changed) + len(added) + len(removed)
+        if n_edits > INCREMENTAL_MAX_FRACTION * len(ids):
+            return False
+
+        calculator.remove(old_ids[removed.tolist()])
+        calculator.update(ids[changed.tolist()], questions[changed.tolist()])
+        calculator.add(ids[added.tolist()], questions[added.tolist()])
+        try:
+            calculator.reweight(new_ids)
+        except ValueError:
+            return False
+        # The bank may have grown past, or shrunk below, SMALL_BANK_QUESTIONS
+        if (calculator.tfidf_matrix is None or calculator.new_vectorizer(calculator.tfidf_matrix.shape[0])
+                .get_params() != calculator.vectorizer.get_params()):
+            return False
+        info['applied'] = True
+        return True
@@ -0,0 +1,190 @@
+import cProfile
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterator, Optional
+
+# Set to a file path to write the JSON event log without code changes
+LOG_ENV = 'QSIM_METRICS_LOG'
+# Set to a folder to capture a cProfile dump of every profiled task there
+PROFILE_ENV = 'QSIM_PROFILE'
+
+# One JSON object per line; quiet unless configure_logging() adds a handler
+logger = logging.getLogger('questions_sim.metrics')
+logger.propagate = False
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """Peak resident memory of this process so far, or None where it cannot be read"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_memory()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_memory() -> Optional[int]:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(Counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+class Metrics:
+    """
+    Process-wide stage timers, counters and gauges, safe to update from any thread.
+    A stage that is logged also writes one JSON line with its duration, its own
+    fields and the peak memory so far, so a slow run can be read from the log alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers: Dict[str, dict] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, object] = {}
+
+    def record(self, name: str, seconds: float, log: bool = True, **fields):
+        """Add one timing of a stage"""
+        with self._lock:
+            timer = self.timers.setdefault(name, {'count': 0, 'total_s': 0.0, 'last_s': 0.0, 'max_s': 0.0})
+            timer['count'] += 1
+            timer['total_s'] += seconds
+            timer['last_s'] = seconds
+            timer['max_s'] = max(timer['max_s'], seconds)
+        if log:
+            self.event(name, seconds=round(seconds, 6), **fields)
+
+    @contextmanager
+    def stage(self, name: str, log: bool = True, **fields) -> Iterator[dict]:
+        """
+        Time the enclosed block as one run of a stage.
+        Yields a dict the block may fill with more fields for the log line.
+        """
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, log, **fields)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value):
+        """Remember the latest value of a size, e.g. the vocabulary of the last fit"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def event(self, name: str, **fields):
+        """Write one JSON line to the metrics log, if logging is configured"""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        record = {'time': round(time.time(), 3), 'event': name, **fields,
+                  'peak_rss': peak_memory_bytes(), 'thread': threading.current_thread().name}
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'timers': {name: dict(timer) for name, timer in self.timers.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'peak_rss': peak_memory_bytes(),
+            }
+
+    def log_summary(self):
+        """Write every timer, counter and gauge as one 'summary' line"""
+        self.event('summary', **{key: value for key, value in self.snapshot().items() if key != 'peak_rss'})
+
+    def reset(self):
+        with self._lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    @contextmanager
+    def profile(self, path: Optional[str]):
+        """Capture a cProfile dump of the enclosed block into path; nothing when path is empty"""
+        if not path:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another thread is already being profiled
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+            self.event('profile', path=path)
+
+
+# The instance every module records into
+metrics = Metrics()
+
+
+def configure_logging(path: Optional[str] = None, max_bytes: int = 5 * 1024 ** 2,
+                      backups: int = 3) -> Optional[str]:
+    """
+    Append metrics events to a rotating JSON-lines file: path, else $QSIM_METRICS_LOG.
+    Returns the file used, or None when logging stays off or the file cannot be opened.
+    """
+    path = path or os.environ.get(LOG_ENV)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    for handler in logger.handlers:
+        if getattr(handler, 'baseFilename', None) == path:
+            return path
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    metrics.event('session', pid=os.getpid(), python=platform.python_version(),
+                  platform=platform.platform(), cpu_count=os.cpu_count(), argv=sys.argv)
+    return path
+
+
+def profile_path(task: str) -> Optional[str]:
+    """Where to dump the profile of a task when $QSIM_PROFILE names a folder"""
+    folder = os.environ.get(PROFILE_ENV)
+    if not folder:
+        return None
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{task}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.prof")
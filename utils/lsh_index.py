@@ -0,0 +1,94 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Mersenne prime used by the universal hash family of the MinHash permutations
+_PRIME = (1 << 31) - 1
+
+class MinHashLSHIndex:
+    """
+    Approximate candidate generation over the character n-grams of a TF-IDF matrix.
+    Each row's n-gram set gets a MinHash signature, split into bands; rows sharing
+    any band bucket with the query become candidates for exact re-scoring.
+    More bands or fewer rows per band raise recall at the cost of more candidates.
+    """
+
+    def __init__(self, bands: int = 20, rows_per_band: int = 3, seed: int = 0):
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+        self.num_perm = bands * rows_per_band
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=self.num_perm).astype(np.int64)
+        self._b = rng.randint(0, _PRIME, size=self.num_perm).astype(np.int64)
+        # Odd 64-bit multipliers that mix one band of a signature into one bucket key
+        self._mix = (rng.randint(0, 1 << 62, size=rows_per_band, dtype=np.int64).astype(np.uint64)
+                     * np.uint64(2) + np.uint64(1))
+
+        self.signatures = None
+        self._keys = []
+        self._orders = []
+
+    def signatures_for(self, matrix: csr_matrix) -> np.ndarray:
+        """MinHash signature (n_rows x num_perm) of the non-zero features of every row"""
+        n_rows = matrix.shape[0]
+        indices = matrix.indices.astype(np.int64)
+        lengths = np.diff(matrix.indptr)
+        non_empty = lengths > 0
+        starts = matrix.indptr[:-1][non_empty]
+
+        # Rows without any feature keep the sentinel and are never bucketed
+        signatures = np.full((n_rows, self.num_perm), _PRIME, dtype=np.uint32)
+        if not len(indices):
+            return signatures
+        for p in range(self.num_perm):
+            hashed = (self._a[p] * indices + self._b[p]) % _PRIME
+            signatures[non_empty, p] = np.minimum.reduceat(hashed, starts)
+        return signatures
+
+    def _band_keys(self, signatures: np.ndarray, band: int) -> np.ndarray:
+        start = band * self.rows_per_band
+        values = signatures[:, start:start + self.rows_per_band].astype(np.uint64)
+        # uint64 arithmetic wraps around, which is what a hash mix wants
+        return (values * self._mix).sum(axis=1, dtype=np.uint64) + np.uint64(band)
+
+    def build(self, matrix: csr_matrix, processed=None) -> 'MinHashLSHIndex':
+        """Compute signatures and band buckets for every row of matrix"""
+        self.signatures = self.signatures_for(matrix)
+        has_features = np.diff(matrix.indptr) > 0
+        rows = np.flatnonzero(has_features)
+
+        self._keys = []
+        self._orders = []
+        for band in range(self.bands):
+            keys = self._band_keys(self.signatures[rows], band)
+            order = np.argsort(keys, kind='stable')
+            self._keys.append(keys[order])
+            self._orders.append(rows[order])
+        return self
+
+    def candidates(self, signature: np.ndarray) -> np.ndarray:
+        """Sorted row ids sharing at least one band bucket with signature"""
+        if self.signatures is None or np.all(signature == _PRIME):
+            return np.empty(0, dtype=np.int64)
+
+        signature = signature.reshape(1, -1)
+        found = []
+        for band in range(self.bands):
+            key = self._band_keys(signature, band)[0]
+            keys = self._keys[band]
+            lo = np.searchsorted(keys, key, side='left')
+            hi = np.searchsorted(keys, key, side='right')
+            if hi > lo:
+                found.append(self._orders[band][lo:hi])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found)).astype(np.int64)
+
+    def candidates_for_row(self, row: int, min_score: float = 0.0) -> np.ndarray:
+        """Candidates for a row of the indexed matrix; min_score does not change them"""
+        return self.candidates(self.signatures[row])
+
+    def candidates_for_vector(self, vector: csr_matrix, min_score: float = 0.0,
+                              processed_text=None) -> np.ndarray:
+        """Candidates for a vector that is not part of the indexed matrix"""
+        return self.candidates(self.signatures_for(vector)[0])
@@ -0,0 +1,145 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Integral
+from scipy.sparse import csr_matrix, vstack
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+from typing import List, Optional, Sequence, Tuple
+from .arabic_processor import ArabicProcessor
+from .vocabulary import SortedVocabulary
+
+# Vectorizer shared by all tasks of one worker process, set by the pool initializer
+_worker_vectorizer = None
+
+
+def _init_worker(vectorizer: TfidfVectorizer):
+    global _worker_vectorizer
+    _worker_vectorizer = vectorizer
+
+
+def _preprocess_chunk(questions: List[str]) -> List[str]:
+    return list(ArabicProcessor.preprocess_batch(questions))
+
+
+def _count_chunk(processed: List[str]) -> Tuple[np.ndarray, csr_matrix]:
+    return _count(processed, _worker_vectorizer)
+
+
+def _count(processed: Sequence[str], vectorizer: TfidfVectorizer) -> Tuple[np.ndarray, csr_matrix]:
+    """N-gram counts of preprocessed questions: (terms, counts), column j of counts being terms[j]"""
+    counter = CountVectorizer(analyzer=vectorizer.build_analyzer())
+    try:
+        counts = counter.fit_transform(processed)
+    except ValueError:
+        # Only empty or stop-word questions in this chunk
+        return np.empty(0, dtype=str), csr_matrix((len(processed), 0), dtype=np.int64)
+
+    vocabulary = counter.vocabulary_
+    keys = np.array(list(vocabulary))
+    terms = np.empty_like(keys)
+    terms[np.fromiter(vocabulary.values(), dtype=np.int64, count=len(vocabulary))] = keys
+    return terms, counts
+
+
+def _split(items: Sequence, n_chunks: int) -> List[Sequence]:
+    size = max(1, -(-len(items) // n_chunks))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _merge_counts(chunks: List[Tuple[np.ndarray, csr_matrix]]) -> Tuple[np.ndarray, csr_matrix]:
+    """Stack per-chunk counts over one shared, sorted term list"""
+    terms, columns = np.unique(np.concatenate([chunk_terms for chunk_terms, _ in chunks]),
+                               return_inverse=True)
+    blocks = []
+    offset = 0
+    for chunk_terms, counts in chunks:
+        # Local column j of this chunk is global column columns[offset + j]
+        indices = columns[offset:offset + len(chunk_terms)][counts.indices]
+        blocks.append(csr_matrix((counts.data, indices, counts.indptr), shape=(counts.shape[0], len(terms))))
+        offset += len(chunk_terms)
+    return terms, csr_matrix(vstack(blocks, format='csr'))
+
+
+def _select_columns(vectorizer: TfidfVectorizer, dfs: np.ndarray, tfs: np.ndarray,
+                    n_docs: int) -> np.ndarray:
+    """
+    Columns kept by max_df/min_df/max_features, applied exactly the way CountVectorizer.fit
+    does to features sorted by term.
+    """
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    high = max_df if isinstance(max_df, Integral) else max_df * n_docs
+    low = min_df if isinstance(min_df, Integral) else min_df * n_docs
+    if high < low:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    mask = (dfs <= high) & (dfs >= low)
+    limit = vectorizer.max_features
+    if limit is not None and mask.sum() > limit:
+        # Same (unstable) ordering as scikit-learn so ties are broken identically
+        mask_inds = (-tfs[mask]).argsort()[:limit]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+
+    kept = np.flatnonzero(mask)
+    if not len(kept):
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    return kept
+
+
+def parallel_preprocess(questions: Sequence[str], n_jobs: int) -> List[str]:
+    """ArabicProcessor.preprocess of every question, across n_jobs processes"""
+    processed: List[str] = []
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        for chunk in pool.map(_preprocess_chunk, _split(questions, n_jobs * 4)):
+            processed.extend(chunk)
+    return processed
+
+
+def parallel_fit_transform(vectorizer: TfidfVectorizer, processed: Sequence[str], n_jobs: int,
+                           multiplicity: Optional[np.ndarray] = None) -> csr_matrix:
+    """
+    Fit and transform preprocessed questions across n_jobs processes (1: in this process).
+    Leaves vectorizer (which must use IDF) fitted exactly as vectorizer.fit_transform would.
+    multiplicity: how many times each question occurs in the bank (default once); the
+    vocabulary and IDF are then those of the bank with every repetition, while only one
+    row per question is transformed.
+    Returns the TF-IDF matrix.
+    """
+    if n_jobs > 1:
+        # One chunk per process: the merge below grows with the number of chunks
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(vectorizer,)) as pool:
+            chunks = list(pool.map(_count_chunk, _split(processed, n_jobs)))
+    else:
+        chunks = [_count(processed, vectorizer)]
+
+    terms, counts = _merge_counts(chunks)
+    if not len(terms):
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+    if vectorizer.binary:
+        counts.data.fill(1)
+
+    if multiplicity is None:
+        multiplicity = np.ones(counts.shape[0], dtype=np.int64)
+    weights = np.repeat(np.asarray(multiplicity, dtype=np.int64), np.diff(counts.indptr))
+    # Integer counts, as scikit-learn sorts them when applying max_features
+    dfs = np.bincount(counts.indices, weights=weights, minlength=len(terms)).astype(np.int64)
+    tfs = np.bincount(counts.indices, weights=counts.data * weights, minlength=len(terms)).astype(np.int64)
+    n_docs = int(np.sum(multiplicity))
+    kept = _select_columns(vectorizer, dfs, tfs, n_docs)
+    # The terms are sorted, so kept term i is column i without a dict to map them
+    vectorizer.vocabulary_ = SortedVocabulary(terms[kept])
+    vectorizer.fixed_vocabulary_ = False
+
+    # Document frequencies over the kept features, as TfidfTransformer.fit computes them
+    df = dfs[kept].astype(np.float64)
+    n_samples = n_docs
+    df += float(vectorizer.smooth_idf)
+    n_samples += int(vectorizer.smooth_idf)
+    vectorizer.idf_ = np.log(n_samples / df) + 1.0
+
+    # The counts already hold every row: no second pass over the texts
+    counts = csr_matrix(counts[:, kept], dtype=np.float64)
+    counts.data *= vectorizer.idf_[counts.indices]
+    return normalize(counts, copy=False)
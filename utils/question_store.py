@@ -0,0 +1,171 @@
+import os
+import sys
+import numpy as np
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Tuple, Union
+
+
+class TextColumn(Sequence):
+    """
+    A read-only sequence of strings kept as one UTF-8 buffer plus an int64 offsets array,
+    instead of one Python object per string: string i is data[offsets[i]:offsets[i + 1]].
+    Strings are decoded only when read. The buffer may be a memory-mapped file, so a
+    saved column opens instantly and only the pages actually read become resident.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, texts: Iterable[str]) -> 'TextColumn':
+        if isinstance(texts, TextColumn):
+            return texts
+        encoded = [str(text).encode('utf-8') for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key: Union[int, slice, Sequence]) -> Union[str, 'TextColumn', List[str]]:
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            # A view: same buffer, no copy
+            return TextColumn(self.data, self.offsets[start:max(start, stop) + 1])
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("TextColumn index out of range")
+            return self.data[self.offsets[key]:self.offsets[key + 1]].tobytes().decode('utf-8')
+        return [self[i] for i in key]
+
+    def __iter__(self) -> Iterator[str]:
+        data = self.data
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].tobytes().decode('utf-8')
+
+    def take(self, indices: Sequence[int]) -> 'TextColumn':
+        """
+        The strings at indices as a new column, copied without decoding. Runs of
+        consecutive indices are copied as one block, so mostly ordered indices cost
+        a memory copy, not a loop over every string.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.offsets[indices + 1] - self.offsets[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        blocks = [self.data[self.offsets[indices[start]]:self.offsets[indices[end - 1] + 1]]
+                  for start, end in _runs(indices)]
+        data = np.concatenate(blocks) if blocks else np.empty(0, dtype=np.uint8)
+        return TextColumn(data, offsets)
+
+    def equal_at(self, rows: Sequence[int], other: 'TextColumn', other_rows: Sequence[int]) -> np.ndarray:
+        """
+        equal[k] is whether self[rows[k]] == other[other_rows[k]], compared as bytes.
+        Runs consecutive in both columns are compared as one block, and split only
+        where they differ, so few changes between two versions of a bank cost little.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        other_rows = np.asarray(other_rows, dtype=np.int64)
+        equal = np.zeros(len(rows), dtype=bool)
+        pending = _runs(rows, other_rows)
+        while pending:
+            start, end = pending.pop()
+            first, last = rows[start], rows[end - 1] + 1
+            other_first, other_last = other_rows[start], other_rows[end - 1] + 1
+            same = (np.array_equal(np.diff(self.offsets[first:last + 1]),
+                                   np.diff(other.offsets[other_first:other_last + 1]))
+                    and np.array_equal(self.data[self.offsets[first]:self.offsets[last]],
+                                       other.data[other.offsets[other_first]:other.offsets[other_last]]))
+            if same:
+                equal[start:end] = True
+            elif end - start > 1:
+                middle = (start + end) // 2
+                pending += [(start, middle), (middle, end)]
+        return equal
+
+    def __reduce__(self):
+        # Pickle only this column's bytes, not the whole buffer a slice shares
+        start, end = int(self.offsets[0]), int(self.offsets[-1])
+        return TextColumn, (np.array(self.data[start:end]), self.offsets - start)
+
+    def __repr__(self) -> str:
+        return f"TextColumn({len(self)} strings, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by this column (for a memory-mapped one, its size on disk)"""
+        return int(self.offsets[-1] - self.offsets[0]) + self.offsets.nbytes
+
+    def save(self, folder: str, name: str):
+        """Write name.utf8 (the buffer) and name.offsets.npy into folder"""
+        start, end = int(self.offsets[0]), int(self.offsets[-1])
+        with open(os.path.join(folder, f'{name}.utf8'), 'wb') as f:
+            f.write(memoryview(np.ascontiguousarray(self.data[start:end])))
+        np.save(os.path.join(folder, f'{name}.offsets.npy'), self.offsets - start)
+
+    @classmethod
+    def load(cls, folder: str, name: str, mmap: bool = True) -> 'TextColumn':
+        """Open a column written by save(), memory-mapped unless mmap is False"""
+        path = os.path.join(folder, f'{name}.utf8')
+        offsets = np.load(os.path.join(folder, f'{name}.offsets.npy'), mmap_mode='r' if mmap else None)
+        if not mmap or os.path.getsize(path) == 0:
+            # An empty file cannot be memory-mapped
+            data = np.fromfile(path, dtype=np.uint8)
+        else:
+            data = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(offsets) == 0 or offsets[-1] != len(data):
+            raise ValueError(f"Offsets do not match {path}")
+        return cls(data, offsets)
+
+
+def _runs(*indices: np.ndarray) -> List[Tuple[int, int]]:
+    """(start, end) of the runs in which every index array goes up by one at each step"""
+    n = len(indices[0])
+    if not n:
+        return []
+    step = np.zeros(n - 1, dtype=bool)
+    for array in indices:
+        step |= np.diff(array) != 1
+    breaks = (np.flatnonzero(step) + 1).tolist()
+    return list(zip([0] + breaks, breaks + [n]))
+
+
+class TextColumnBuilder:
+    """
+    Build a TextColumn from strings that arrive chunk by chunk: each chunk is encoded
+    into one growing buffer, so only the current chunk exists as Python strings.
+    """
+
+    def __init__(self):
+        self._data = bytearray()
+        self._lengths: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(lengths) for lengths in self._lengths)
+
+    def extend(self, texts: Iterable[str]):
+        encoded = [str(text).encode('utf-8') for text in texts]
+        self._lengths.append(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)))
+        self._data += b''.join(encoded)
+
+    def build(self) -> TextColumn:
+        lengths = np.concatenate(self._lengths) if self._lengths else np.empty(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # A view of the buffer, not a copy
+        return TextColumn(np.frombuffer(self._data, dtype=np.uint8), offsets)
+
+
+def text_bytes(texts: Sequence) -> int:
+    """Memory used by a list of strings or a TextColumn"""
+    if isinstance(texts, TextColumn):
+        return texts.nbytes
+    return sys.getsizeof(texts) + sum(sys.getsizeof(text) for text in texts)
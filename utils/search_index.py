@@ -0,0 +1,44 @@
+import numpy as np
+from typing import Sequence
+from .arabic_processor import ArabicProcessor
+
+# Separates the id from the question; stripped from queries so a match cannot span both
+_SEPARATOR = '\x00'
+
+class SearchIndex:
+    """
+    Substring search over question ids and texts, built once per loaded file.
+    Texts are lower-cased and Arabic-normalized, so a search ignores diacritics
+    and alef/teh marbuta/yeh variants.
+    """
+
+    def __init__(self, ids: Sequence[str], questions: Sequence[str]):
+        self._rows = [self.normalize(f"{qid}{_SEPARATOR}{question}")
+                      for qid, question in zip(ids, questions)]
+        self._last_query = ''
+        self._last_matches = np.arange(len(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ArabicProcessor.normalize_arabic(str(text).lower())
+
+    def search(self, query: str) -> np.ndarray:
+        """Indices of the rows whose id or question contains query, in file order"""
+        query = self.normalize(query).replace(_SEPARATOR, '')
+        if not query:
+            return np.arange(len(self._rows))
+
+        # While typing, each query extends the previous one: only its matches can still match
+        if self._last_query and self._last_query in query:
+            candidates = self._last_matches
+        else:
+            candidates = np.arange(len(self._rows))
+
+        rows = self._rows
+        matches = candidates[np.fromiter((query in rows[i] for i in candidates.tolist()),
+                                         dtype=bool, count=len(candidates))]
+        self._last_query, self._last_matches = query, matches
+        return matches
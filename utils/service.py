@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .candidate_index import make_candidate_index
+from .index_cache import load_bank
+from .instrumentation import configure_logging, metrics
+from .similarity import SimilarityCalculator
+from .vectorizer_profiles import DEFAULT_PROFILE, VECTORIZER_PROFILES
+
+MAX_BODY_BYTES = 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large'}
+
+class SimilarityService:
+    """
+    Keep one fitted SimilarityCalculator resident and answer duplicate lookups
+    over a small local HTTP/JSON API:
+
+        GET  /health
+        GET  /metrics   timers, counters, index sizes and peak memory
+        POST /query  {"text": "...", "top_n": 10, "min_score": 0.5}
+        GET  /query?text=...&top_n=10&min_score=0.5
+
+    calculator may also be a ShardedSimilarityIndex wrapping the fitted one.
+    """
+
+    def __init__(self, calculator: SimilarityCalculator, ids: Sequence[str], questions: Sequence[str]):
+        self.calculator = calculator
+        self.ids = ids
+        self.questions = questions
+
+    def query(self, text: str, top_n: int = 10, min_score: float = 0.0) -> dict:
+        """Look up a free-text question; runs on an executor thread"""
+        start = time.perf_counter()
+        similar = self.calculator.query_text(text, top_n, min_score)
+        return {
+            'results': [{'id': self.ids[idx], 'question': self.questions[idx], 'score': round(score, 4)}
+                        for idx, score in similar],
+            'elapsed_ms': round(1000 * (time.perf_counter() - start), 3),
+        }
+
+    async def _route(self, method: str, target: str, body: bytes) -> Tuple[int, dict]:
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'questions': len(self.questions),
+                         'vectorizer': self.calculator.profile}
+        if url.path == '/metrics':
+            return 200, metrics.snapshot()
+        if url.path != '/query':
+            return 404, {'error': f"Unknown path: {url.path}"}
+
+        if method == 'GET':
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        elif method == 'POST':
+            try:
+                params = json.loads(body or b'{}')
+            except ValueError:
+                return 400, {'error': "Body must be JSON"}
+            if not isinstance(params, dict):
+                return 400, {'error': "Body must be a JSON object"}
+        else:
+            return 405, {'error': f"Method not allowed: {method}"}
+
+        try:
+            text = str(params['text'])
+            top_n = int(params.get('top_n', 10))
+            min_score = float(params.get('min_score', 0.0))
+        except (KeyError, TypeError, ValueError):
+            return 400, {'error': "Expected 'text' and optional numeric 'top_n', 'min_score'"}
+
+        # Keep the event loop free for other clients while scoring
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.query, text, top_n, min_score)
+        return 200, result
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive between requests"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self._route(method.upper(), target, body)
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = (connection != 'close' if version == 'HTTP/1.1'
+                                  else connection == 'keep-alive')
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                    + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765):
+        """Run the HTTP server until cancelled"""
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            print(f"Serving {len(self.questions)} questions on http://{host}:{port}", flush=True)
+            await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve duplicate-question lookups over local HTTP/JSON")
+    parser.add_argument('file', help="Question bank with id and question columns "
+                                         "(xlsx, xls, csv, parquet or jsonl)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--jobs', type=int, default=1, help="Worker processes for fitting (-1 for all cores)")
+    parser.add_argument('--candidates', choices=('all', 'inverted', 'lsh'), default='all',
+                        help="First retrieval stage; 'all' scores every question")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="Score each query with this many worker processes sharing the index")
+    parser.add_argument('--vectorizer', choices=VECTORIZER_PROFILES, default=DEFAULT_PROFILE,
+                        help="Vectorizer profile: n-gram range and feature cap")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    calculator = SimilarityCalculator(n_jobs=args.jobs,
+                                      candidate_index=make_candidate_index(args.candidates),
+                                      profile=args.vectorizer)
+    ids, questions = load_bank(args.file, calculator)
+
+    sharded = None
+    if args.shards > 1:
+        from .sharded_index import ShardedSimilarityIndex
+        sharded = ShardedSimilarityIndex(calculator, args.shards).start()
+
+    try:
+        asyncio.run(SimilarityService(sharded or calculator, ids, questions).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sharded is not None:
+            sharded.close()
+        metrics.log_summary()
+
+
+if __name__ == "__main__":
+    main()
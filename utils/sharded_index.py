@@ -0,0 +1,220 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from scipy.sparse import csr_matrix
+from typing import Dict, List, Optional, Sequence, Tuple
+from .instrumentation import metrics
+from .similarity import (BATCH_BLOCK_BYTES, SimilarityCalculator, _empty_results, score_block,
+                         score_row_bytes, take_results, top_k_dense)
+
+# The fitted matrix as seen by one worker process, set by the pool initializer
+_worker_matrix = None
+_worker_segments: List[shared_memory.SharedMemory] = []
+# Shard views built by this worker; building one validates all its indices
+_worker_shards: Dict[Tuple[int, int], csr_matrix] = {}
+
+
+def _attach(specs: List[Tuple[str, str, int]], shape: Tuple[int, int]):
+    """Pool initializer: map the shared CSR arrays into this worker without copying them"""
+    global _worker_matrix
+    arrays = []
+    for name, dtype, length in specs:
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments.append(segment)
+        arrays.append(np.ndarray(length, dtype=dtype, buffer=segment.buf))
+    _worker_matrix = csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def _row_slice(matrix: csr_matrix, start: int, end: int) -> csr_matrix:
+    """Rows start:end of a CSR matrix as views of its data and indices"""
+    lo, hi = matrix.indptr[start], matrix.indptr[end]
+    return csr_matrix((matrix.data[lo:hi], matrix.indices[lo:hi], matrix.indptr[start:end + 1] - lo),
+                      shape=(end - start, matrix.shape[1]), copy=False)
+
+
+def _score_shard(start: int, end: int, query_indices: Optional[np.ndarray],
+                 vectors: Optional[csr_matrix], top_n: int,
+                 min_score: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-k of one shard (rows start:end) for rows of the matrix or for outside vectors"""
+    shard = _worker_shards.get((start, end))
+    if shard is None:
+        shard = _worker_shards[(start, end)] = _row_slice(_worker_matrix, start, end)
+    queries = _worker_matrix[query_indices] if vectors is None else vectors
+    scores = score_block(shard, queries)
+    if query_indices is not None:
+        # A question is never similar to itself
+        inside = (query_indices >= start) & (query_indices < end)
+        scores[np.flatnonzero(inside), query_indices[inside] - start] = 0
+    indptr, indices, values = top_k_dense(scores, top_n, min_score)
+    return indptr, indices + start, values
+
+
+def merge_top_k(parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]], n_queries: int,
+                top_n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge the CSR-style top-k results of several shards for the same queries"""
+    queries = np.concatenate([np.repeat(np.arange(n_queries), np.diff(indptr)) for indptr, _, _ in parts])
+    indices = np.concatenate([indices for _, indices, _ in parts])
+    scores = np.concatenate([scores for _, _, scores in parts])
+
+    # By query, then by descending score
+    order = np.lexsort((indices, -scores, queries))
+    queries, indices, scores = queries[order], indices[order], scores[order]
+    rank = np.arange(len(queries)) - np.searchsorted(queries, queries)
+    keep = rank < top_n
+
+    indptr = np.zeros(n_queries + 1, dtype=np.int64)
+    np.cumsum(np.bincount(queries[keep], minlength=n_queries), out=indptr[1:])
+    return indptr, indices[keep], scores[keep]
+
+
+class ShardedSimilarityIndex:
+    """
+    Spread the scoring of a fitted SimilarityCalculator over worker processes.
+    The CSR matrix is moved into shared memory once; every worker maps it
+    without copying and scores the row range (shard) a task names. Queries are
+    scattered to all shards and the per-shard top-k are merged.
+    Candidate indexes are not used: every shard is scored exhaustively.
+
+    Use as a context manager, or call close(), to stop the workers and free
+    the shared memory.
+    """
+
+    def __init__(self, calculator: SimilarityCalculator, n_shards: int = -1):
+        self.calculator = calculator
+        self.n_shards = (os.cpu_count() or 1) if n_shards == -1 else max(1, n_shards)
+        self._segments: List[shared_memory.SharedMemory] = []
+        self._pool = None
+        self._bounds: List[Tuple[int, int]] = []
+
+    @property
+    def tfidf_matrix(self) -> Optional[csr_matrix]:
+        return self.calculator.tfidf_matrix
+
+    @property
+    def questions(self) -> Sequence[str]:
+        return self.calculator.questions
+
+    @property
+    def profile(self) -> str:
+        return self.calculator.profile
+
+    def start(self) -> 'ShardedSimilarityIndex':
+        """Move the matrix into shared memory and start one worker per shard"""
+        matrix = self.calculator.tfidf_matrix
+        if matrix is None or self._pool is not None:
+            return self
+
+        specs = []
+        arrays = []
+        for array in (matrix.data, matrix.indices, matrix.indptr):
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+            shared[:] = array
+            self._segments.append(segment)
+            specs.append((segment.name, array.dtype.str, len(array)))
+            arrays.append(shared)
+        # The calculator reads the shared copy too, so the matrix is held only once
+        self.calculator.tfidf_matrix = csr_matrix(tuple(arrays), shape=matrix.shape, copy=False)
+
+        n_rows = matrix.shape[0]
+        edges = np.linspace(0, n_rows, min(self.n_shards, max(n_rows, 1)) + 1).astype(int)
+        self._bounds = [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+        self._pool = ProcessPoolExecutor(max_workers=len(self._bounds), initializer=_attach,
+                                         initargs=(specs, matrix.shape))
+        return self
+
+    def close(self):
+        """Stop the workers and free the shared memory; the calculator keeps a private copy"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._segments:
+            matrix = self.calculator.tfidf_matrix
+            self.calculator.tfidf_matrix = csr_matrix(
+                (matrix.data.copy(), matrix.indices.copy(), matrix.indptr.copy()), shape=matrix.shape)
+            for segment in self._segments:
+                segment.close()
+                segment.unlink()
+            self._segments = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def _block_rows(self) -> int:
+        """Queries per scattered task so each shard's dense score block stays under BATCH_BLOCK_BYTES"""
+        shard_rows = max(end - start for start, end in self._bounds)
+        return max(1, BATCH_BLOCK_BYTES // score_row_bytes(self.calculator.tfidf_matrix, shard_rows))
+
+    def _scatter(self, n_queries: int, top_n: int, min_score: float,
+                 query_indices: Optional[np.ndarray] = None,
+                 vectors: Optional[csr_matrix] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._pool is None:
+            self.start()
+        metrics.count('queries', n_queries)
+        metrics.count('candidates_scored', n_queries * self.tfidf_matrix.shape[0])
+        step = self._block_rows()
+        blocks = []
+        for first in range(0, n_queries, step):
+            last = min(first + step, n_queries)
+            block_indices = None if query_indices is None else query_indices[first:last]
+            block_vectors = None if vectors is None else vectors[first:last]
+            futures = [self._pool.submit(_score_shard, start, end, block_indices, block_vectors,
+                                         top_n, min_score)
+                       for start, end in self._bounds]
+            blocks.append(merge_top_k([future.result() for future in futures], last - first, top_n))
+
+        lengths = np.concatenate([np.diff(indptr) for indptr, _, _ in blocks])
+        indptr = np.zeros(n_queries + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return (indptr, np.concatenate([indices for _, indices, _ in blocks]),
+                np.concatenate([scores for _, _, scores in blocks]))
+
+    def get_similar_batch(self, query_indices, top_n: int = 100, min_score: float = 0.0,
+                          exact: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Same results as SimilarityCalculator.get_similar_batch, scored across the shards"""
+        query_indices = np.asarray(query_indices, dtype=np.int64).ravel()
+        if self.tfidf_matrix is None or not len(query_indices):
+            return _empty_results(len(query_indices))
+        with metrics.stage('query', log=False):
+            # Shards score matrix rows; duplicate questions share one
+            rows, inverse = np.unique(self.calculator.question_rows[query_indices], return_inverse=True)
+            results = self._scatter(len(rows), top_n, min_score, query_indices=rows)
+            return self.calculator.expand_results(take_results(results, inverse), top_n, min_score,
+                                                  query_indices)
+
+    def get_similar_questions(self, query_idx: int, top_n: int = 100,
+                              min_score: float = 0.0) -> List[Tuple[int, float]]:
+        if self.tfidf_matrix is None or query_idx >= len(self.calculator.questions):
+            return []
+        _, indices, scores = self.get_similar_batch([query_idx], top_n, min_score)
+        return list(zip(indices.tolist(), scores.tolist()))
+
+    def get_similar_vectors(self, vectors: csr_matrix, top_n: int = 100, min_score: float = 0.0,
+                            exact: bool = False, texts: Optional[Sequence[str]] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Same results as SimilarityCalculator.get_similar_vectors, scored across the shards"""
+        if self.tfidf_matrix is None or not vectors.shape[0]:
+            return _empty_results(vectors.shape[0])
+        with metrics.stage('query_vectors', log=False):
+            results = self._scatter(vectors.shape[0], top_n, min_score, vectors=vectors)
+            return self.calculator.expand_results(results, top_n, min_score)
+
+    def query_text(self, text: str, top_n: int = 10, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Questions most similar to a new text, scored across the shards"""
+        if self.tfidf_matrix is None:
+            return []
+        vector = self.calculator._query_vectors(self.calculator.processor.preprocess(text))
+        if not vector.nnz:
+            return []
+        _, indices, scores = self.get_similar_vectors(vector, top_n, min_score)
+        return list(zip(indices.tolist(), scores.tolist()))
+
+    def transform(self, questions: List[str]) -> csr_matrix:
+        return self.calculator.transform(questions)
+
+    def memory_report(self) -> dict:
+        return self.calculator.memory_report()
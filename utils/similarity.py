@@ -1,48 +1,783 @@
+import os
+import sys
+import time
+from collections import Counter
+from functools import lru_cache
 import numpy as np
+from scipy.sparse import csr_matrix, vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Tuple
+from sklearn.preprocessing import normalize
+from typing import List, Optional, Sequence, Tuple, Union
 from .arabic_processor import ArabicProcessor
+from .candidate_index import InvertedIndex
+from .instrumentation import metrics
+from .lsh_index import MinHashLSHIndex
+from .question_store import TextColumn, text_bytes
+from .vocabulary import SortedVocabulary
+from .vectorizer_profiles import DEFAULT_PROFILE, make_vectorizer
+
+# Below this many questions a process pool costs more than it saves
+PARALLEL_MIN_QUESTIONS = 20000
+
+# Upper bound for the dense score block of one batched query step
+BATCH_BLOCK_BYTES = 64 * 1024 ** 2
+
+# Recent free-text query vectors kept by query_text()
+QUERY_CACHE_SIZE = 1024
+
+# Precision of the fitted index; similarity scores need nothing finer
+INDEX_DTYPE = np.float32
+
+# Banks with fewer distinct questions ignore the profile's min_df/max_df
+SMALL_BANK_QUESTIONS = 100
+
+# Wider query rows (hashed n-grams) are scored with a sparse product instead of made dense
+DENSE_QUERY_MAX_FEATURES = 65536
+
+# Re-ranking this share of the bank or more is slower than scoring every row
+CANDIDATE_MAX_FRACTION = 0.3
+
+
+def top_k_dense(scores: np.ndarray, top_n: int,
+                min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select the best columns of every row of a dense score block.
+    Scores that are not positive or fall below min_score are dropped.
+    Returns CSR-style (indptr, indices, scores), each row sorted by descending score.
+    """
+    n_rows, n_cols = scores.shape
+    k = min(top_n, n_cols)
+    if k <= 0:
+        return _empty_results(n_rows)
+    
+    # Partial selection first, then sort only the k survivors of each row
+    if k < n_cols:
+        top = np.argpartition(scores, n_cols - k, axis=1)[:, n_cols - k:]
+    else:
+        top = np.tile(np.arange(n_cols), (n_rows, 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    
+    keep = (top_scores > 0) & (top_scores >= min_score)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(keep.sum(axis=1), out=indptr[1:])
+    return indptr, top[keep].astype(np.int64), top_scores[keep]
+
+
+def score_block(matrix: csr_matrix, queries: csr_matrix) -> np.ndarray:
+    """Dense (queries x rows) dot products of query rows with the rows of matrix"""
+    if matrix.shape[1] <= DENSE_QUERY_MAX_FEATURES:
+        return np.ascontiguousarray((matrix @ queries.toarray().T).T)
+    return (queries @ matrix.T).toarray()
+
+
+def score_row_bytes(matrix: csr_matrix, n_rows: int) -> int:
+    """Memory score_block() needs per query row against n_rows rows of matrix, with top-k selection"""
+    # The score block plus the index array produced by partial selection
+    row_bytes = n_rows * (matrix.dtype.itemsize + np.dtype(np.int64).itemsize)
+    if matrix.shape[1] <= DENSE_QUERY_MAX_FEATURES:
+        row_bytes += matrix.shape[1] * matrix.dtype.itemsize
+    return row_bytes
+
+
+def _repeated(ids: Sequence[str]) -> List[str]:
+    """The ids that occur more than once"""
+    return [qid for qid, count in Counter(ids).items() if count > 1]
+
+
+def _grow(array: np.ndarray, used: int, size: int) -> np.ndarray:
+    """A writable copy of array[:used] with room for at least size items, and a quarter more"""
+    grown = np.empty(max(size, used + used // 4 + 1), dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+def _empty_results(n_queries: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (np.zeros(n_queries + 1, dtype=np.int64),
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+
+def take_results(results: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                 order: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR-style results whose row i is row order[i] of results"""
+    indptr, indices, scores = results
+    if len(order) == len(indptr) - 1 and np.array_equal(order, np.arange(len(order))):
+        return results
+    counts = np.diff(indptr)[order]
+    new_indptr = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_indptr[1:])
+    gather = np.arange(new_indptr[-1]) - np.repeat(new_indptr[:-1], counts) + np.repeat(indptr[:-1][order], counts)
+    return new_indptr, indices[gather], scores[gather]
+
+
+def _stack_results(parts: List[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate CSR-style result blocks into one"""
+    if not parts:
+        return _empty_results(0)
+    lengths = np.concatenate([np.diff(indptr) for indptr, _, _ in parts])
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return (indptr, np.concatenate([indices for _, indices, _ in parts]),
+            np.concatenate([scores for _, _, scores in parts]))
+
 
 class SimilarityCalculator:
     """Calculate similarity between Arabic questions"""
     
-    def __init__(self):
+    def __init__(self, n_jobs: int = 1,
+                 candidate_index: Optional[Union[InvertedIndex, MinHashLSHIndex]] = None,
+                 profile: str = DEFAULT_PROFILE):
+        """
+        n_jobs: worker processes used by fit() on large banks (-1 for all CPU cores)
+        candidate_index: optional first retrieval stage, built by fit() and used to pick the
+        rows a query scores exactly; without it every query scores every row
+        profile: name of the vectorizer settings, see VECTORIZER_PROFILES
+        """
+        self.n_jobs = n_jobs
+        self.candidate_index = candidate_index
         self.processor = ArabicProcessor()
-        self.vectorizer = TfidfVectorizer(
-            analyzer='char',  # Use character n-grams for Arabic
-            ngram_range=(2, 4),
-            max_features=5000
-        )
+        self.profile = profile
+        # Character n-grams suit Arabic's rich morphology
+        self.vectorizer = make_vectorizer(profile)
         self.questions = []
+        # Preprocessed text of every matrix row; only filled while fit() runs
         self.processed_questions = []
         self.tfidf_matrix = None
+        # Questions identical after preprocessing share one matrix row:
+        # question_rows[i] is the row of question i, and the questions of row r
+        # are row_members[row_members_ptr[r]:row_members_ptr[r + 1]]
+        self.question_rows = np.empty(0, dtype=np.int32)
+        self.row_members_ptr = np.zeros(1, dtype=np.int64)
+        self.row_members = np.empty(0, dtype=np.int32)
+        self.has_duplicates = False
+        # Id of every question, for add(), update() and remove(); None when fit() had none
+        self.ids = None
+        # Edits since the last reweight(): _live[i] is whether question i is still in the
+        # bank, _positions maps ids to questions, rows from _base_rows on were added and
+        # _added_counts holds their n-gram counts; _buffers and _text_buffers are the arrays
+        # of the matrix and of the questions and ids, with room to append
+        self._clear_edits()
+        self._query_vectors = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._vectorize)
         
-    def fit(self, questions: List[str]):
-        """Fit the model with questions"""
-        self.questions = questions
-        self.processed_questions = [self.processor.preprocess(q) for q in questions]
+    def fit(self, questions: Sequence[str], ids: Optional[Sequence[str]] = None):
+        """
+        Fit the model with questions.
+        ids: unique id of every question, needed to edit the bank with add(), update() and remove()
+        """
+        if ids is not None and len(ids) != len(questions):
+            raise ValueError("ids and questions must have the same length")
+        # One UTF-8 buffer instead of a Python string per question
+        self.questions = TextColumn.from_strings(questions)
+        self.ids = None if ids is None else TextColumn.from_strings(ids)
+        questions = self.questions
         
-        if self.processed_questions:
-            self.tfidf_matrix = self.vectorizer.fit_transform(self.processed_questions)
+        n_jobs = (os.cpu_count() or 1) if self.n_jobs == -1 else self.n_jobs
+        parallel = n_jobs > 1 and len(questions) >= PARALLEL_MIN_QUESTIONS
+        with metrics.stage('fit', questions=len(questions), jobs=n_jobs if parallel else 1,
+                           profile=self.profile) as info:
+            with metrics.stage('fit.preprocess'):
+                if parallel:
+                    from .parallel_fit import parallel_preprocess
+                    processed = parallel_preprocess(questions, n_jobs)
+                else:
+                    processed = list(self.processor.preprocess_batch(questions))
+            
+            # Every distinct text is vectorized and scored once, but counts as often as
+            # it occurs: the vocabulary and IDF are those of the whole bank
+            self.processed_questions, question_rows = self.collapse_duplicates(processed)
+            self.set_question_rows(question_rows)
+            multiplicity = np.diff(self.row_members_ptr)
+            
+            self.vectorizer = self.new_vectorizer(len(self.processed_questions))
+            with metrics.stage('fit.vectorize', rows=len(self.processed_questions)):
+                if not self.processed_questions:
+                    self.tfidf_matrix = None
+                elif isinstance(self.vectorizer, TfidfVectorizer):
+                    from .parallel_fit import parallel_fit_transform
+                    self.tfidf_matrix = parallel_fit_transform(self.vectorizer, self.processed_questions,
+                                                               n_jobs if parallel else 1, multiplicity)
+                else:
+                    # A hashing vectorizer has no vocabulary to merge across processes
+                    self.tfidf_matrix = self.vectorizer.fit_transform(self.processed_questions, multiplicity)
+                self.compact()
+            
+            with metrics.stage('fit.index', candidates=None if self.candidate_index is None
+                               else type(self.candidate_index).__name__):
+                self.build_indexes()
+            self.processed_questions = []
+            info.update(self.record_sizes())
+    
+    def new_vectorizer(self, n_rows: int):
+        """An unfitted vectorizer of the profile for a bank of n_rows distinct questions"""
+        # min_df/max_df would prune everything useful from a handful of questions
+        return make_vectorizer(self.profile, df_limits=n_rows >= SMALL_BANK_QUESTIONS)
+    
+    @property
+    def edits_pending(self) -> bool:
+        """Whether add(), update() or remove() changed the bank since the last reweight()"""
+        return self._live is not None
+    
+    def add(self, ids: Sequence[str], questions: Sequence[str]):
+        """
+        Add questions to the fitted bank under new ids, vectorizing only them: their
+        n-grams are counted into the document frequencies, and their rows are weighted
+        with the current IDF and appended to the matrix. Other rows keep their weights,
+        and queries score every row, until reweight().
+        A new question identical to one already in the bank gets a row of its own.
+        Needs a bank fitted with ids by a hashing profile.
+        """
+        ids = [str(qid) for qid in ids]
+        if len(ids) != len(questions):
+            raise ValueError("ids and questions must have the same length")
+        self._start_edits()
+        clashing = [qid for qid in ids if qid in self._positions] + _repeated(ids)
+        if clashing:
+            raise ValueError(f"Question ids already in the bank or repeated: {clashing}")
+        if not ids:
+            return
+        
+        with metrics.stage('edit.add', log=False):
+            distinct, local_rows = self.collapse_duplicates(list(self.processor.preprocess_batch(questions)))
+            multiplicity = np.bincount(local_rows, minlength=len(distinct))
+            counts = self.vectorizer.count(distinct)
+            self.vectorizer.update_df(counts, self.vectorizer.count([]), multiplicity)
+            
+            n_rows, n_questions = self.tfidf_matrix.shape[0], len(self.questions)
+            self._append_rows(self._compact_matrix(self.vectorizer.weight(counts)))
+            self._added_counts.append(counts)
+            
+            self.question_rows = np.concatenate([self.question_rows, local_rows + n_rows]).astype(np.int32)
+            members = np.argsort(local_rows, kind='stable') + n_questions
+            self.row_members = np.concatenate([self.row_members, members]).astype(np.int32)
+            self.row_members_ptr = np.concatenate([self.row_members_ptr,
+                                                   self.row_members_ptr[-1] + np.cumsum(multiplicity)])
+            self._append_texts('questions', questions)
+            self._append_texts('ids', ids)
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+            self._positions.update(zip(ids, range(n_questions, n_questions + len(ids))))
+    
+    def remove(self, ids: Sequence[str]):
+        """
+        Take questions out of the fitted bank by id. Their n-grams leave the document
+        frequencies, and a row left without questions is zeroed so no query finds it;
+        reweight() drops both for good. Needs a bank fitted with ids by a hashing profile.
+        """
+        ids = [str(qid) for qid in ids]
+        self._start_edits()
+        missing = [qid for qid in ids if qid not in self._positions]
+        if missing:
+            raise KeyError(f"Unknown question ids: {missing}")
+        repeated = _repeated(ids)
+        if repeated:
+            raise ValueError(f"Question ids repeated: {repeated}")
+        if not ids:
+            return
+        
+        with metrics.stage('edit.remove', log=False):
+            positions = np.array([self._positions[qid] for qid in ids], dtype=np.int64)
+            removed = self.vectorizer.count(list(self.processor.preprocess_batch(
+                self.questions[positions.tolist()])))
+            self.vectorizer.update_df(self.vectorizer.count([]), removed)
+            
+            # The questions of a row are kept in ascending order
+            rows = self.question_rows[positions]
+            ptr = self.row_members_ptr
+            slots = [ptr[row] + np.searchsorted(self.row_members[ptr[row]:ptr[row + 1]], position)
+                     for row, position in zip(rows.tolist(), positions.tolist())]
+            self.row_members = np.delete(self.row_members, slots)
+            ptr[1:] -= np.cumsum(np.bincount(rows, minlength=len(ptr) - 1))
+            
+            matrix = self.tfidf_matrix
+            for row in rows[ptr[rows] == ptr[rows + 1]].tolist():
+                matrix.data[matrix.indptr[row]:matrix.indptr[row + 1]] = 0
+            self._live[positions] = False
+            for qid in ids:
+                del self._positions[qid]
+    
+    def update(self, ids: Sequence[str], questions: Sequence[str]):
+        """Replace the text of questions of the fitted bank, see remove() and add()"""
+        ids = [str(qid) for qid in ids]
+        if len(ids) != len(questions):
+            raise ValueError("ids and questions must have the same length")
+        self._start_edits()
+        missing = [qid for qid in ids if qid not in self._positions]
+        if missing:
+            raise KeyError(f"Unknown question ids: {missing}")
+        self.remove(ids)
+        self.add(ids, questions)
+    
+    def reweight(self, ids: Optional[Sequence[str]] = None):
+        """
+        Settle the edits made since the last reweight(): weight every row with the IDF of
+        the current document frequencies, drop removed questions and the rows they left
+        empty, and rebuild the candidate indexes. This costs time in proportion to the
+        whole bank, so it is meant to run once after a batch of edits.
+        Rows fitted before the edits are scaled by the change of the IDF rather than
+        recounted, so n-grams the last fit() pruned stay out of them until the next fit().
+        ids: the ids of the remaining questions in the order to keep them in; by default
+        they stay in the order they were added
+        """
+        if self._live is None:
+            return
+        
+        with metrics.stage('reweight', questions=int(np.count_nonzero(self._live))) as info:
+            if ids is None:
+                order = np.flatnonzero(self._live)
+            else:
+                order = np.array([self._positions[str(qid)] for qid in ids], dtype=np.int64)
+                if len(order) != np.count_nonzero(self._live) or len(np.unique(order)) != len(order):
+                    raise ValueError("ids must list every question of the bank once")
+            
+            previous = self.vectorizer.refresh_idf()
+            # Rows are normalized, so scaling by the IDF change and normalizing again
+            # is the same as weighting their counts with the new IDF
+            ratio = np.divide(self.vectorizer.idf_, previous, out=np.zeros_like(previous),
+                              where=previous > 0)
+            base = csr_matrix(self.tfidf_matrix[:self._base_rows], dtype=np.float64)
+            base.data *= ratio[base.indices]
+            # Added rows are weighted again from their counts: n-grams new to the bank had no IDF yet
+            blocks = [base] + ([self.vectorizer.weight(vstack(self._added_counts, format='csr'))]
+                               if self._added_counts else [])
+            
+            # Rows in order of first use, like fit() lays them out
+            sources = self.question_rows[order]
+            _, first = np.unique(sources, return_index=True)
+            rows = sources[np.sort(first)]
+            position = np.empty(self.tfidf_matrix.shape[0], dtype=np.int64)
+            position[rows] = np.arange(len(rows))
+            matrix = vstack(blocks, format='csr')[rows]
+            matrix.eliminate_zeros()
+            
+            self.questions = self.questions.take(order)
+            self.ids = self.ids.take(order)
+            self.tfidf_matrix = self._compact_matrix(matrix) if len(rows) else None
+            self.set_question_rows(position[sources])
+            self.build_indexes()
+            info.update(self.record_sizes())
+    
+    def _start_edits(self):
+        """Check that the bank can be edited, and set up the state the edits work on"""
+        if self._live is not None:
+            return
+        if (self.ids is None or self.tfidf_matrix is None
+                or getattr(self.vectorizer, 'df_', None) is None):
+            raise ValueError("Editing needs a bank fitted with ids by a hashing profile")
+        positions = {qid: i for i, qid in enumerate(self.ids)}
+        if len(positions) != len(self.ids):
+            raise ValueError(f"Question ids repeated: {_repeated(self.ids)}")
+        
+        self._positions = positions
+        self._live = np.ones(len(self.questions), dtype=bool)
+        self._base_rows = self.tfidf_matrix.shape[0]
+        # Writable, with room for new rows: a restored matrix is a read-only memory map
+        matrix = self.tfidf_matrix
+        self._buffers = tuple(_grow(array, len(array), len(array)) for array in
+                              (matrix.data, matrix.indices, matrix.indptr))
+        self._install_buffers(*matrix.shape)
+        for name in ('questions', 'ids'):
+            column = TextColumn.from_strings(getattr(self, name))
+            start, end = int(column.offsets[0]), int(column.offsets[-1])
+            data = _grow(column.data[start:end], end - start, end - start)
+            offsets = _grow(column.offsets - start, len(column) + 1, len(column) + 1)
+            self._text_buffers[name] = (data, offsets)
+            setattr(self, name, TextColumn(data[:end - start], offsets[:len(column) + 1]))
+        # Edited rows no longer map one to one to questions
+        self.has_duplicates = True
+    
+    def _append_rows(self, rows: csr_matrix):
+        """Append rows to the matrix in place, growing its buffers only now and then"""
+        data, indices, indptr = self._buffers
+        n_rows, nnz = self.tfidf_matrix.shape[0], self.tfidf_matrix.nnz
+        if nnz + rows.nnz > len(data):
+            data = _grow(data, nnz, nnz + rows.nnz)
+            indices = _grow(indices, nnz, nnz + rows.nnz)
+        if n_rows + rows.shape[0] + 1 > len(indptr):
+            indptr = _grow(indptr, n_rows + 1, n_rows + rows.shape[0] + 1)
+        data[nnz:nnz + rows.nnz] = rows.data
+        indices[nnz:nnz + rows.nnz] = rows.indices
+        indptr[n_rows + 1:n_rows + rows.shape[0] + 1] = rows.indptr[1:] + nnz
+        self._buffers = (data, indices, indptr)
+        self._install_buffers(n_rows + rows.shape[0], self.tfidf_matrix.shape[1])
     
-    def get_similar_questions(self, query_idx: int, top_n: int = 100) -> List[Tuple[int, float]]:
-        """Get most similar questions to the query question"""
+    def _install_buffers(self, n_rows: int, n_columns: int):
+        data, indices, indptr = self._buffers
+        nnz = int(indptr[n_rows])
+        self.tfidf_matrix = csr_matrix((data[:nnz], indices[:nnz], indptr[:n_rows + 1]),
+                                       shape=(n_rows, n_columns), copy=False)
+    
+    def _append_texts(self, name: str, texts: Sequence[str]):
+        """Append texts to the questions or ids column in place, like _append_rows()"""
+        data, offsets = self._text_buffers[name]
+        column = getattr(self, name)
+        n, used = len(column), int(column.offsets[-1])
+        added = TextColumn.from_strings(texts)
+        size = int(added.offsets[-1] - added.offsets[0])
+        if used + size > len(data):
+            data = _grow(data, used, used + size)
+        if n + len(added) + 1 > len(offsets):
+            offsets = _grow(offsets, n + 1, n + len(added) + 1)
+        data[used:used + size] = added.data[added.offsets[0]:added.offsets[-1]]
+        offsets[n + 1:n + len(added) + 1] = added.offsets[1:] - added.offsets[0] + used
+        self._text_buffers[name] = (data, offsets)
+        setattr(self, name, TextColumn(data[:used + size], offsets[:n + len(added) + 1]))
+    
+    def _clear_edits(self):
+        self._live = None
+        self._positions = None
+        self._buffers = None
+        self._text_buffers = {}
+        self._base_rows = 0
+        self._added_counts = []
+    
+    def record_sizes(self) -> dict:
+        """Publish the size of the fitted index as metrics gauges, and return them"""
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+        idf = getattr(self.vectorizer, 'idf_', None)
+        if vocabulary is None and idf is not None:
+            # Hashed n-grams: the columns the bank actually uses
+            n_grams = int(np.count_nonzero(idf))
+        else:
+            n_grams = len(vocabulary or {})
+        sizes = {
+            'questions': len(self.questions),
+            'rows': 0 if self.tfidf_matrix is None else self.tfidf_matrix.shape[0],
+            'vocabulary': n_grams,
+            'nnz': 0 if self.tfidf_matrix is None else int(self.tfidf_matrix.nnz),
+            'index_bytes': self.memory_report()['total_bytes'],
+        }
+        for name, value in sizes.items():
+            metrics.gauge(name, value)
+        return sizes
+    
+    @staticmethod
+    def collapse_duplicates(processed: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Distinct preprocessed texts, in order of first appearance, and the position of
+        every question's text among them. Empty texts are never merged.
+        """
+        rows = {}
+        unique = []
+        question_rows = np.empty(len(processed), dtype=np.int32)
+        for i, text in enumerate(processed):
+            row = rows.get(text) if text else None
+            if row is None:
+                row = len(unique)
+                unique.append(text)
+                if text:
+                    rows[text] = row
+            question_rows[i] = row
+        return unique, question_rows
+    
+    def set_question_rows(self, question_rows: np.ndarray):
+        """Install the question -> matrix row mapping and derive its row -> questions inverse"""
+        self.question_rows = np.asarray(question_rows, dtype=np.int32)
+        n_rows = int(self.question_rows.max()) + 1 if len(self.question_rows) else 0
+        self.row_members = np.argsort(self.question_rows, kind='stable').astype(np.int32)
+        self.row_members_ptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.question_rows, minlength=n_rows), out=self.row_members_ptr[1:])
+        self.has_duplicates = n_rows < len(self.question_rows)
+        # A new mapping comes from a fit, a cache or reweight(): no edits are pending
+        self._clear_edits()
+    
+    def compact(self):
+        """
+        Shrink the fitted state: float32 scores with int32 indices, rows L2-normalized
+        once so a plain sparse dot product is the cosine similarity, and no copy of
+        the pruned n-grams.
+        """
+        if self.tfidf_matrix is not None:
+            self.tfidf_matrix = self._compact_matrix(self.tfidf_matrix)
+        
+        # scikit-learn keeps every pruned n-gram for introspection only
+        if getattr(self.vectorizer, 'stop_words_', None) is not None:
+            self.vectorizer.stop_words_ = None
+    
+    @staticmethod
+    def _compact_matrix(matrix: csr_matrix) -> csr_matrix:
+        matrix = csr_matrix(matrix, dtype=INDEX_DTYPE)
+        # Rounding to float32 moves the norms slightly off 1
+        normalize(matrix, copy=False)
+        if matrix.nnz < np.iinfo(np.int32).max:
+            matrix.indices = matrix.indices.astype(np.int32, copy=False)
+            matrix.indptr = matrix.indptr.astype(np.int32, copy=False)
+        return matrix
+    
+    def transform(self, questions: List[str]) -> csr_matrix:
+        """Vectorize questions that are not part of the fitted bank, in the index format"""
+        processed = list(self.processor.preprocess_batch(questions))
+        return self._compact_matrix(self._tfidf(processed))
+    
+    def _tfidf(self, processed: List[str]) -> csr_matrix:
+        """TF-IDF rows of preprocessed texts, L2-normalized, as the fitted vectorizer weighs them"""
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+        if not isinstance(vocabulary, SortedVocabulary):
+            return self.vectorizer.transform(processed)
+        # scikit-learn would look every n-gram up one by one
+        counts = vocabulary.count(self.vectorizer.build_analyzer(), processed)
+        if self.vectorizer.binary:
+            counts.data.fill(1)
+        counts.data *= self.vectorizer.idf_[counts.indices]
+        return normalize(counts, copy=False)
+    
+    def memory_report(self) -> dict:
+        """Approximate resident size of the fitted index, in bytes"""
+        matrix = self.tfidf_matrix
+        matrix_bytes = 0 if matrix is None else matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        matrix_bytes += self.question_rows.nbytes + self.row_members.nbytes + self.row_members_ptr.nbytes
+        
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None) or {}
+        if isinstance(vocabulary, SortedVocabulary):
+            vocabulary_bytes = vocabulary.nbytes
+        else:
+            vocabulary_bytes = sys.getsizeof(vocabulary) + sum(sys.getsizeof(term) for term in vocabulary)
+        idf = getattr(self.vectorizer, 'idf_', None)
+        if idf is not None:
+            vocabulary_bytes += idf.nbytes
+        
+        texts = text_bytes(self.questions) + text_bytes(self.processed_questions)
+        
+        total = matrix_bytes + vocabulary_bytes + texts
+        return {
+            'questions': len(self.questions),
+            'rows': 0 if matrix is None else matrix.shape[0],
+            'matrix_bytes': matrix_bytes,
+            'vocabulary_bytes': vocabulary_bytes,
+            'text_bytes': texts,
+            'total_bytes': total,
+            'bytes_per_question': total / max(len(self.questions), 1),
+        }
+    
+    def build_indexes(self):
+        """Build the optional candidate indexes over the fitted matrix"""
+        # Vectors cached for the previous fit are meaningless now
+        self._query_vectors.cache_clear()
+        if self.candidate_index is None or self.tfidf_matrix is None:
+            return
+        if getattr(self.candidate_index, 'uses_texts', False):
+            # A cached bank is restored without its preprocessed texts
+            representatives = self.row_members[self.row_members_ptr[:-1]]
+            processed = (self.processed_questions or list(self.processor.preprocess_batch(
+                [self.questions[i] for i in representatives.tolist()])))
+            self.candidate_index.build(self.tfidf_matrix, processed)
+        else:
+            self.candidate_index.build(self.tfidf_matrix)
+    
+    def _candidates(self, row: int, min_score: float = 0.0) -> Optional[np.ndarray]:
+        """Rows worth scoring for a matrix row, or None to score them all"""
+        # Until reweight() the candidate indexes do not know the edited rows
+        if self.candidate_index is not None and not self.edits_pending:
+            return self.candidate_index.candidates_for_row(row, min_score)
+        return None
+    
+    def _candidates_for_vector(self, vector: csr_matrix, min_score: float = 0.0,
+                               processed_text: Optional[str] = None) -> Optional[np.ndarray]:
+        """Rows worth scoring for a vector that is not part of the matrix, or None for all"""
+        if self.candidate_index is not None and not self.edits_pending:
+            return self.candidate_index.candidates_for_vector(vector, min_score, processed_text)
+        return None
+    
+    def _vectorize(self, processed_text: str) -> csr_matrix:
+        # Same dtype as the index, so scoring never upcasts the whole matrix
+        return self._tfidf([processed_text]).astype(INDEX_DTYPE)
+    
+    def get_similar_questions(self, query_idx: int, top_n: int = 100, min_score: float = 0.0,
+                              exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        Get most similar questions to the query question.
+        exact: score every question even when a candidate index is available
+        """
         if self.tfidf_matrix is None or query_idx >= len(self.questions):
             return []
         
-        # Get similarity scores
-        query_vector = self.tfidf_matrix[query_idx]
-        similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
+        _, indices, scores = self.get_similar_batch([query_idx], top_n, min_score, exact)
+        return list(zip(indices.tolist(), scores.tolist()))
+    
+    def get_similar_batch(self, query_indices, top_n: int = 100, min_score: float = 0.0,
+                          exact: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the most similar questions for many query questions at once.
+        Returns CSR-style (indptr, indices, scores): the neighbours of query_indices[i] are
+        indices[indptr[i]:indptr[i + 1]], sorted by descending score, all >= min_score.
+        """
+        query_indices = np.asarray(query_indices, dtype=np.int64).ravel()
+        if self.tfidf_matrix is None or not len(query_indices):
+            return _empty_results(len(query_indices))
+        
+        # Queries run at interactive rates: timed and counted, not logged one by one
+        with metrics.stage('query', log=False):
+            # Duplicate questions in one batch share their row's scoring
+            rows, inverse = np.unique(self.question_rows[query_indices], return_inverse=True)
+            if not exact and self.candidate_index is not None and not self.edits_pending:
+                results = _stack_results([self._score_candidates(row, top_n, min_score) for row in rows])
+            else:
+                step = self._block_rows()
+                results = _stack_results([
+                    self._score_rows(self.tfidf_matrix[rows[start:start + step]], top_n, min_score,
+                                     exclude=rows[start:start + step])
+                    for start in range(0, len(rows), step)])
+            metrics.count('queries', len(query_indices))
+            return self.expand_results(take_results(results, inverse), top_n, min_score, query_indices)
+    
+    def expand_results(self, results: Tuple[np.ndarray, np.ndarray, np.ndarray], top_n: int,
+                       min_score: float = 0.0, query_indices: Optional[np.ndarray] = None
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Turn per-query results over matrix rows into results over questions: every row
+        becomes all of its questions. When the queries are questions of the bank
+        (query_indices), their exact duplicates come first with a score of 1.
+        """
+        if not self.has_duplicates:
+            return results
+        
+        indptr, rows, scores = results
+        n_queries = len(indptr) - 1
+        queries = [np.repeat(np.arange(n_queries), np.diff(indptr))]
+        members = [rows]
+        values = [scores]
+        if query_indices is not None and min_score <= 1:
+            own_rows = self.question_rows[query_indices]
+            queries.insert(0, np.arange(n_queries))
+            members.insert(0, own_rows)
+            values.insert(0, np.ones(n_queries, dtype=scores.dtype))
+        
+        queries = np.concatenate(queries)
+        rows = np.concatenate(members)
+        scores = np.concatenate(values)
+        
+        counts = np.diff(self.row_members_ptr)[rows]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        questions = self.row_members[np.repeat(self.row_members_ptr[rows], counts) + offsets]
+        queries = np.repeat(queries, counts)
+        scores = np.repeat(scores, counts)
+        
+        keep = np.ones(len(questions), dtype=bool)
+        if query_indices is not None:
+            # A question is never similar to itself
+            keep = questions != query_indices[queries]
+        # Stable, so duplicates stay first and neighbours keep their score order
+        order = np.argsort(queries[keep], kind='stable')
+        queries, questions, scores = queries[keep][order], questions[keep][order], scores[keep][order]
+        
+        rank = np.arange(len(queries)) - np.searchsorted(queries, queries)
+        keep = rank < top_n
+        indptr = np.zeros(n_queries + 1, dtype=np.int64)
+        np.cumsum(np.bincount(queries[keep], minlength=n_queries), out=indptr[1:])
+        return indptr, questions[keep].astype(np.int64), scores[keep]
+    
+    def get_similar_vectors(self, vectors: csr_matrix, top_n: int = 100, min_score: float = 0.0,
+                            exact: bool = False, texts: Optional[Sequence[str]] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Like get_similar_batch, for the rows of vectors: questions from outside the
+        fitted bank, vectorized with transform().
+        texts: the original questions, for candidate indexes that look at words
+        """
+        if self.tfidf_matrix is None or not vectors.shape[0]:
+            return _empty_results(vectors.shape[0])
         
-        # Get top N similar questions (excluding the query itself)
-        similar_indices = similarities.argsort()[::-1]
+        with metrics.stage('query_vectors', log=False):
+            if not exact and self.candidate_index is not None and not self.edits_pending:
+                processed = ([None] * vectors.shape[0] if texts is None
+                             else list(self.processor.preprocess_batch(texts)))
+                parts = [self._score_vector(vectors[i],
+                                            self._candidates_for_vector(vectors[i], min_score, processed[i]),
+                                            top_n, min_score)
+                         for i in range(vectors.shape[0])]
+            else:
+                step = self._block_rows()
+                parts = [self._score_rows(vectors[start:start + step], top_n, min_score)
+                         for start in range(0, vectors.shape[0], step)]
+            metrics.count('queries', vectors.shape[0])
+            return self.expand_results(_stack_results(parts), top_n, min_score)
+    
+    def _block_rows(self) -> int:
+        """Query rows scored at once so one dense score block stays under BATCH_BLOCK_BYTES"""
+        return max(1, BATCH_BLOCK_BYTES // score_row_bytes(self.tfidf_matrix, self.tfidf_matrix.shape[0]))
+    
+    def _score_rows(self, queries: csr_matrix, top_n: int, min_score: float,
+                    exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Top rows of the bank for every query row; exclude[i] is never returned for row i"""
+        # TF-IDF rows are L2-normalized, so one sparse product gives every cosine similarity
+        scores = score_block(self.tfidf_matrix, queries)
+        metrics.count('candidates_scored', scores.size)
+        if exclude is not None:
+            # A question is never similar to itself
+            scores[np.arange(len(exclude)), exclude] = 0
+        return top_k_dense(scores, top_n, min_score)
+    
+    def _score_candidates(self, row: int, top_n: int,
+                          min_score: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Exact scores of the candidate rows of one matrix row"""
+        return self._score_vector(self.tfidf_matrix[row], self._candidates(row, min_score),
+                                  top_n, min_score, exclude=row)
+    
+    def _score_vector(self, vector: csr_matrix, candidates: Optional[np.ndarray], top_n: int,
+                      min_score: float, exclude: int = -1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Top rows for one query vector, scoring only candidates when given"""
+        if candidates is not None and len(candidates) >= CANDIDATE_MAX_FRACTION * self.tfidf_matrix.shape[0]:
+            candidates = None
+        rows = self.tfidf_matrix if candidates is None else self.tfidf_matrix[candidates]
+        metrics.count('candidates_scored', rows.shape[0])
+        # Sparse matrix times a dense vector: no sparse result to assemble
+        scores = (rows @ vector.toarray().ravel())[np.newaxis, :]
+        if candidates is None:
+            candidates = np.arange(rows.shape[0])
+        scores[0, candidates == exclude] = 0
+        
+        indptr, positions, values = top_k_dense(scores, top_n, min_score)
+        return indptr, candidates[positions], values
+    
+    def query_text(self, text: str, top_n: int = 10, min_score: float = 0.0,
+                   exact: bool = False) -> List[Tuple[int, float]]:
+        """Get the questions most similar to a new text that is not part of the fitted bank"""
+        if self.tfidf_matrix is None:
+            return []
+        
+        with metrics.stage('query_text', log=False):
+            processed = self.processor.preprocess(text)
+            vector = self._query_vectors(processed)
+            if not vector.nnz:
+                return []
+            
+            candidates = None if exact else self._candidates_for_vector(vector, min_score, processed)
+            results = self._score_vector(vector, candidates, top_n, min_score)
+            metrics.count('queries')
+            _, indices, scores = self.expand_results(results, top_n, min_score)
+            return list(zip(indices.tolist(), scores.tolist()))
+    
+    def measure_recall(self, sample_size: int = 200, top_n: int = 10,
+                       min_score: float = 0.0, seed: int = 0) -> dict:
+        """Compare candidate-based queries with exhaustive scoring on a random sample of questions"""
+        n_questions = 0 if self.tfidf_matrix is None else len(self.questions)
+        n_rows = 0 if self.tfidf_matrix is None else self.tfidf_matrix.shape[0]
+        rng = np.random.RandomState(seed)
+        sample = rng.choice(n_questions, size=min(sample_size, n_questions), replace=False)
         
-        results = []
-        for idx in similar_indices:
-            if idx != query_idx and similarities[idx] > 0:
-                results.append((idx, similarities[idx]))
-                if len(results) >= top_n:
-                    break
+        found = expected = candidates = 0
+        exact_time = approximate_time = 0.0
+        for query_idx in sample:
+            start = time.perf_counter()
+            truth = {idx for idx, _ in self.get_similar_questions(query_idx, top_n, min_score,
+                                                                  exact=True)}
+            exact_time += time.perf_counter() - start
+            
+            start = time.perf_counter()
+            approximate = {idx for idx, _ in self.get_similar_questions(query_idx, top_n, min_score)}
+            approximate_time += time.perf_counter() - start
+            
+            found += len(truth & approximate)
+            expected += len(truth)
+            query_candidates = self._candidates(self.question_rows[query_idx], min_score)
+            candidates += n_rows if query_candidates is None else len(query_candidates)
         
-        return results
\ No newline at end of file
+        queries = max(len(sample), 1)
+        return {
+            'queries': len(sample),
+            'recall': found / expected if expected else 1.0,
+            'mean_candidates': candidates / queries,
+            'exact_ms': 1000 * exact_time / queries,
+            'approximate_ms': 1000 * approximate_time / queries,
+        }
\ No newline at end of file
@@ -0,0 +1,148 @@
+import csv
+import random
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .candidate_index import make_candidate_index
+from .question_store import TextColumn
+from .similarity import SimilarityCalculator
+from .vectorizer_profiles import VECTORIZER_PROFILES
+
+# Spelling variants that normalization does not undo on its own
+LETTER_SWAPS = {'ا': 'أ', 'ه': 'ة', 'ي': 'ى', 'ة': 'ه', 'ى': 'ي'}
+
+
+def read_pairs(file_path: str, ids: Sequence[str]) -> List[Tuple[int, int]]:
+    """
+    Known duplicates from a CSV file with two question ids per line (header optional).
+    Returns pairs of question positions.
+    """
+    positions = {qid: i for i, qid in enumerate(ids)}
+    pairs = []
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        for number, row in enumerate(csv.reader(f), 1):
+            if not row or not ''.join(row).strip():
+                continue
+            if len(row) < 2:
+                raise ValueError(f"Line {number} of {file_path} needs two question ids")
+            first, second = row[0].strip(), row[1].strip()
+            if first not in positions or second not in positions:
+                if number == 1:
+                    continue  # Header
+                raise ValueError(f"Line {number} of {file_path} has an unknown question id")
+            pairs.append((positions[first], positions[second]))
+    if not pairs:
+        raise ValueError(f"No known duplicate pairs in {file_path}")
+    return pairs
+
+
+def make_variant(question: str, rng: random.Random) -> str:
+    """
+    The question as someone else might have written it: one word dropped, two words
+    swapped or one letter deleted or doubled, sometimes with other letter forms.
+    """
+    words = question.split()
+    edit = rng.random()
+    if len(words) > 3 and edit < 0.3:
+        del words[rng.randrange(len(words))]
+    elif len(words) > 1 and edit < 0.6:
+        i = rng.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+    else:
+        long_words = [i for i, word in enumerate(words) if len(word) > 3]
+        if long_words:
+            i = rng.choice(long_words)
+            j = rng.randrange(1, len(words[i]) - 1)
+            word = words[i]
+            words[i] = word[:j] + word[j + 1:] if edit < 0.8 else word[:j] + word[j] + word[j:]
+    text = ' '.join(words)
+    if rng.random() < 0.5:
+        text = ''.join(LETTER_SWAPS.get(letter, letter) if rng.random() < 0.3 else letter
+                       for letter in text)
+    return text
+
+
+def sample_rows(n_questions: int, size: int, keep: Sequence[int], seed: int = 0) -> np.ndarray:
+    """Sorted positions of size questions (all when size is 0), always including keep"""
+    if not size or size >= n_questions:
+        return np.arange(n_questions)
+    keep = np.unique(np.asarray(keep, dtype=np.int64))
+    rng = np.random.RandomState(seed)
+    others = np.setdiff1d(np.arange(n_questions), keep)
+    extra = rng.choice(others, size=max(0, min(size - len(keep), len(others))), replace=False)
+    return np.sort(np.concatenate([keep, extra]))
+
+
+def tune_profiles(questions: Sequence[str], pairs: Optional[List[Tuple[int, int]]] = None,
+                  profiles: Optional[Sequence[str]] = None, top_n: int = 10, queries: int = 500,
+                  sample: int = 0, candidates: str = 'all', n_jobs: int = 1, seed: int = 0,
+                  progress: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """
+    Fit every vectorizer profile on questions and measure what it costs and finds.
+    pairs: known duplicates (i, j); querying question i should return question j.
+    Without pairs, queries random edits of questions (see make_variant) and expects
+    the original back.
+    sample: fit on this many questions, including every queried one (0 for all)
+    Returns one result per profile: fit time, index size, per-query latency and recall@top_n.
+    progress: optional callback receiving each result as soon as it is measured
+    """
+    rng = random.Random(seed)
+    if pairs:
+        tests = rng.sample(pairs, min(queries, len(pairs)))
+    else:
+        sources = rng.sample(range(len(questions)), min(queries, len(questions)))
+        tests = [(make_variant(questions[i], rng), i) for i in sources]
+
+    # Every question a test needs is fitted; positions are renumbered to the sample
+    needed = [i for pair in tests for i in pair] if pairs else [expected for _, expected in tests]
+    rows = sample_rows(len(questions), sample, needed, seed)
+    if len(rows) < len(questions):
+        position = {row: n for n, row in enumerate(rows.tolist())}
+        tests = [(position[query] if pairs else query, position[expected]) for query, expected in tests]
+        questions = TextColumn.from_strings(questions[row] for row in rows.tolist())
+
+    results = []
+    for profile in profiles or list(VECTORIZER_PROFILES):
+        calculator = SimilarityCalculator(n_jobs=n_jobs, candidate_index=make_candidate_index(candidates),
+                                          profile=profile)
+        start = time.perf_counter()
+        calculator.fit(questions)
+        fit_s = time.perf_counter() - start
+
+        question_rows = calculator.question_rows
+        hits = 0
+        latencies = np.zeros(len(tests))
+        for n, (query, expected) in enumerate(tests):
+            start = time.perf_counter()
+            if pairs:
+                similar = calculator.get_similar_questions(query, top_n)
+            else:
+                similar = calculator.query_text(query, top_n)
+            latencies[n] = time.perf_counter() - start
+            # Questions identical after preprocessing are all equally right
+            hits += any(question_rows[idx] == question_rows[expected] for idx, _ in similar)
+
+        memory = calculator.memory_report()
+        matrix = calculator.tfidf_matrix
+        result = {
+            'profile': profile,
+            'questions': len(questions),
+            # Columns actually used: a hashing profile has many more that stay empty
+            'features': 0 if matrix is None else int(np.count_nonzero(np.bincount(matrix.indices))),
+            'fit_s': fit_s,
+            'index_mb': (memory['matrix_bytes'] + memory['vocabulary_bytes']) / 1024 ** 2,
+            'query_ms': 1000 * float(latencies.mean()) if len(tests) else 0.0,
+            'query_p95_ms': 1000 * float(np.percentile(latencies, 95)) if len(tests) else 0.0,
+            'queries': len(tests),
+            'recall': hits / len(tests) if tests else 1.0,
+        }
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
+
+
+def recommend(results: List[dict], min_recall: float) -> Optional[Dict]:
+    """The profile with the fastest queries among those reaching min_recall, if any"""
+    passing = [result for result in results if result['recall'] >= min_recall]
+    return min(passing, key=lambda result: (result['query_ms'], result['fit_s'])) if passing else None
@@ -0,0 +1,38 @@
+from typing import Dict
+
+# Named trade-offs between speed, memory and how finely questions are told apart.
+# Keys are TfidfVectorizer arguments; 'hashing' selects HashingTfidfVectorizer,
+# which takes n_features instead of max_features.
+# 'char_wb' builds n-grams inside word boundaries only, 'char' also across words.
+VECTORIZER_PROFILES: Dict[str, dict] = {
+    # The original settings: small and fast, but on large banks 5000 n-grams
+    # are too few to tell many distinct questions apart
+    'default': {'analyzer': 'char', 'ngram_range': (2, 4), 'max_features': 5000},
+    'fast': {'analyzer': 'char_wb', 'ngram_range': (3, 3), 'max_features': 20000, 'min_df': 2},
+    'balanced': {'analyzer': 'char_wb', 'ngram_range': (2, 4), 'max_features': 100000,
+                 'min_df': 2, 'max_df': 0.5},
+    'precise': {'analyzer': 'char', 'ngram_range': (2, 5), 'min_df': 2, 'max_df': 0.5},
+    'hashing': {'hashing': True, 'analyzer': 'char_wb', 'ngram_range': (2, 4),
+                'n_features': 2 ** 18, 'min_df': 2, 'max_df': 0.5},
+}
+
+DEFAULT_PROFILE = 'default'
+
+
+def make_vectorizer(profile: str = DEFAULT_PROFILE, df_limits: bool = True):
+    """
+    A new, unfitted vectorizer for a named profile.
+    df_limits: False drops min_df/max_df, which a bank of a few questions cannot satisfy
+    """
+    if profile not in VECTORIZER_PROFILES:
+        raise ValueError(f"Unknown vectorizer profile: {profile}")
+    settings = dict(VECTORIZER_PROFILES[profile])
+    if not df_limits:
+        settings.pop('min_df', None)
+        settings.pop('max_df', None)
+    # Imported here: the GUI lists the profiles before scikit-learn is loaded
+    if settings.pop('hashing', False):
+        from .hashing_vectorizer import HashingTfidfVectorizer
+        return HashingTfidfVectorizer(**settings)
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(**settings)
@@ -0,0 +1,55 @@
+import numpy as np
+from collections.abc import Mapping
+from itertools import chain
+from scipy.sparse import csr_matrix
+from typing import Callable, Iterator, List, Sequence
+
+
+class SortedVocabulary(Mapping):
+    """
+    A fitted vocabulary kept as one sorted array of n-grams, term i being column i, instead
+    of a dict holding a Python string per n-gram: a fraction of the memory, and saved and
+    memory-mapped as a single .npy file. Reads like the term -> column dict scikit-learn
+    builds, whose columns are in sorted term order too; count() looks up the n-grams of
+    whole documents at once with a binary search.
+    """
+
+    def __init__(self, terms: np.ndarray):
+        self.terms = terms
+
+    def __getitem__(self, term: str) -> int:
+        column = int(np.searchsorted(self.terms, term))
+        if column < len(self.terms) and self.terms[column] == term:
+            return column
+        raise KeyError(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.terms.tolist())
+
+    def __repr__(self) -> str:
+        return f"SortedVocabulary({len(self)} terms, {self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        return self.terms.nbytes
+
+    def lookup(self, terms: np.ndarray) -> np.ndarray:
+        """Column of every term, -1 for terms outside the vocabulary"""
+        columns = np.searchsorted(self.terms, terms)
+        found = columns < len(self.terms)
+        found[found] = self.terms[columns[found]] == terms[found]
+        return np.where(found, columns, -1)
+
+    def count(self, analyzer: Callable[[str], List[str]], documents: Sequence[str]) -> csr_matrix:
+        """Counts of the vocabulary's terms in documents, as CountVectorizer.transform gives them"""
+        grams = [analyzer(document) for document in documents]
+        lengths = np.fromiter(map(len, grams), dtype=np.int64, count=len(grams))
+        columns = self.lookup(np.array(list(chain.from_iterable(grams)), dtype=str))
+        rows = np.repeat(np.arange(len(grams)), lengths)
+        found = columns >= 0
+        # Repeated (row, column) pairs add up to the count of the n-gram
+        return csr_matrix((np.ones(np.count_nonzero(found)), (rows[found], columns[found])),
+                          shape=(len(grams), len(self.terms)))